@@ -2,9 +2,29 @@
 import os
 import json
 import time
+import glob
+import zlib
+import base64
+import hashlib
+import threading
+import urllib.request
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from flask import Flask, request, jsonify, Response
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow os formatos arrow/parquet (e o cache colunar) ficam indisponíveis
+    pa = pq = feather = None
+
+try:
+    import zstandard
+except ImportError:  # sem zstandard só há gzip
+    zstandard = None
+
 app = Flask(__name__)
 
 # =========================
@@ -16,19 +36,210 @@ CSV_URL  = os.environ.get("CSV_URL")          # URL direta (Dropbox ?dl=1, Supab
 CSV_PATH = os.environ.get("CSV_PATH", "")     # Caminho no repositório (fallback)
 CSV_SEP  = os.environ.get("CSV_SEP")          # Forçar separador (ex.: ";")
 APP_VER  = os.environ.get("APP_VER", "1.0.0")
+CACHE_DIR = os.environ.get("DATA_CACHE_DIR", ".cache_dados")  # cache colunar do dataset ("" desativa)
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "1000"))  # tamanho padrão no modo cursor
+ARROW_BATCH_ROWS  = int(os.environ.get("ARROW_BATCH_ROWS", "65536"))  # linhas por record batch / row group
+CHUNK_ROWS        = int(os.environ.get("CHUNK_ROWS", "1000"))          # linhas por pedaço nas respostas JSON/NDJSON
+SNAPSHOT_KEEP     = int(os.environ.get("SNAPSHOT_KEEP", "2"))          # versões mantidas para leituras fixadas (?version=)
+DATE_RANGES_KEEP  = int(os.environ.get("DATE_RANGES_KEEP", "64"))      # faixas since/until/prefixo guardadas por snapshot
+RESPONSE_CACHE_ENTRIES  = int(os.environ.get("RESPONSE_CACHE_ENTRIES", "256"))   # 0 desliga o cache de respostas
+RESPONSE_CACHE_MB       = float(os.environ.get("RESPONSE_CACHE_MB", "128"))      # teto total do cache
+RESPONSE_CACHE_ENTRY_MB = float(os.environ.get("RESPONSE_CACHE_ENTRY_MB", "16")) # respostas maiores só são transmitidas
+GZIP_LEVEL        = int(os.environ.get("GZIP_LEVEL", "6"))
+ZSTD_LEVEL        = int(os.environ.get("ZSTD_LEVEL", "3"))
+
+COLUMNAR_MIMETYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Cache em memória: snapshots imutáveis (DataFrame + índices + versão).
+# Leitores pegam a referência de _snapshot uma vez e usam até o fim da requisição;
+# toda carga (a primeira e as do /reload) roda numa thread só, que monta o
+# próximo snapshot e troca a referência de uma vez.
+_snapshot = None
+_snapshots = {}            # versão -> Snapshot (as SNAPSHOT_KEEP mais recentes)
+_next_version = 1
+_load_lock = threading.Lock()     # publicação do snapshot
+_reload_lock = threading.Lock()   # qual é a carga em curso (segurado só por instantes, sem I/O)
+_reload_thread = None             # carga em curso (ou a última)
+_reload_error = None              # erro da última carga, se falhou
+
+_SEM_LINHAS = np.empty(0, dtype=np.intp)
+
+
+# =========================
+# Índices do dataset
+# =========================
+class DatasetIndex:
+    """
+    Estruturas de busca montadas uma vez por carga:
+      - cliente -> posições das linhas (ordenadas)
+      - date_purchase ordenado (+ ordem das linhas) e, por mês, as posições
+        das linhas já em ordem crescente
+    Os filtros viram buscas binárias / dicionário, sem varrer o dataset.
+    Faixas since/until/prefixo são postas em ordem de linha na primeira
+    consulta e guardadas: as páginas seguintes só fatiam.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self.by_client = None
+        self.sorted_dates = None
+        self.date_order = None
+        self.month_bounds = {}
+        self.month_rows = {}
+        self._range_rows = {}
+        self._range_lock = threading.Lock()
 
-# Cache em memória
-_df_cache = None
+        if "fk_contact" in df.columns:
+            self.by_client = df.groupby(df["fk_contact"].astype(str), sort=False).indices
+
+        if "date_purchase" in df.columns:
+            dates = df["date_purchase"].astype(str).to_numpy(dtype=str)
+            self.date_order = np.argsort(dates, kind="stable")
+            self.sorted_dates = dates[self.date_order]
+            months, starts = np.unique(self.sorted_dates.astype("U7"), return_index=True)
+            ends = np.append(starts[1:], len(self.sorted_dates))
+            self.month_bounds = {m: (int(a), int(b)) for m, a, b in zip(months, starts, ends)}
+            self.month_rows = {m: np.sort(self.date_order[a:b]) for m, (a, b) in self.month_bounds.items()}
+
+    def client_rows(self, cliente: str) -> np.ndarray:
+        return self.by_client.get(str(cliente), _SEM_LINHAS)
+
+    def _date_rows(self, lo: int, hi: int) -> np.ndarray:
+        # devolve em ordem de linha (o cursor depende de posições crescentes); ordena uma vez por faixa
+        rows = self._range_rows.get((lo, hi))
+        if rows is None:
+            rows = np.sort(self.date_order[lo:hi])
+            if DATE_RANGES_KEEP > 0:
+                with self._range_lock:
+                    if len(self._range_rows) >= DATE_RANGES_KEEP:
+                        self._range_rows.pop(next(iter(self._range_rows)))
+                    self._range_rows[(lo, hi)] = rows
+        return rows
+
+    def date_prefix_rows(self, prefix: str) -> np.ndarray:
+        """Equivalente a date_purchase.str.startswith(prefix)."""
+        if prefix in self.month_rows:
+            return self.month_rows[prefix]
+        if len(prefix) == 7 and prefix[4:5] == "-":
+            return _SEM_LINHAS
+        # prefixo genérico (ano, dia, ...): [prefix, prefix com o último caractere + 1)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        lo = int(np.searchsorted(self.sorted_dates, prefix, side="left"))
+        hi = int(np.searchsorted(self.sorted_dates, upper, side="left"))
+        return self._date_rows(lo, hi)
+
+    def since_rows(self, since: str) -> np.ndarray:
+        """date_purchase >= since, ignorando 'NaT' (que ordena depois dos dígitos)."""
+        lo = int(np.searchsorted(self.sorted_dates, since, side="left"))
+        hi = int(np.searchsorted(self.sorted_dates, ":", side="left"))
+        return self._date_rows(lo, max(lo, hi))
+
+    def until_rows(self, until: str) -> np.ndarray:
+        """date_purchase <= until (data ISO, inclusive)."""
+        hi = int(np.searchsorted(self.sorted_dates, until, side="right"))
+        return self._date_rows(0, hi)
+
+
+def combine_rows(a, b):
+    """Interseção de dois conjuntos de posições (None = todas as linhas)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+# Chaves de agrupamento do /aggregates: nome -> (coluna de origem, derivação)
+GROUP_KEYS = {
+    "day":         ("date_purchase", lambda s: s),
+    "month":       ("date_purchase", lambda s: s.str[:7]),
+    "weekday":     ("date_purchase", lambda s: pd.to_datetime(s, format="%Y-%m-%d", errors="coerce").dt.dayofweek.astype("Int64")),
+    "hour":        ("time_purchase", lambda s: pd.to_numeric(s.astype(str).str[:2], errors="coerce").astype("Int64")),
+    "origin":      ("place_origin_departure", lambda s: s),
+    "destination": ("place_destination_departure", lambda s: s),
+    "bus_company": ("fk_departure_ota_bus_company", lambda s: s),
+}
+
+# Medidas do /aggregates: nome -> (coluna, função de agregação)
+MEASURES = {
+    "gmv":     ("gmv_success", "sum"),
+    "tickets": ("total_tickets_quantity_success", "sum"),
+    "count":   (None, "size"),
+    "clients": ("fk_contact", "nunique"),
+}
+
+
+class Snapshot:
+    """Uma versão carregada do dataset. Nunca é alterada depois de publicada."""
+
+    def __init__(self, df: pd.DataFrame, version: int):
+        self.df = df.reset_index(drop=True)  # posição da linha == rótulo do índice
+        self.index = DatasetIndex(self.df)
+        self.version = version
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._keys = {}
+
+    def group_key(self, name: str) -> pd.Series:
+        """Coluna derivada para agrupamento (mês, hora, ...), calculada uma vez por snapshot."""
+        col = self._keys.get(name)
+        if col is None:
+            src, derive = GROUP_KEYS[name]
+            col = self._keys[name] = derive(self.df[src]).rename(name)
+        return col
 
 
 # =========================
 # Utilidades
 # =========================
 def set_df_cache(df):
-    """Atualiza o cache."""
-    global _df_cache
-    _df_cache = df
-    return _df_cache
+    """Publica df como nova versão do dataset (None limpa o cache)."""
+    global _snapshot
+    if df is None:
+        _snapshot = None
+        _snapshots.clear()
+        return None
+    with _load_lock:
+        _publish_locked(df)
+        return _snapshot.df
+
+
+def get_snapshot(version=None) -> Snapshot:
+    """
+    Snapshot atual ou a versão pedida (KeyError se ela já saiu). Com o
+    servidor frio espera a carga em curso, a do /reload se houver, e só
+    inicia uma se nenhuma estiver rodando: o dataset é lido uma vez.
+    """
+    if version is not None:
+        return _snapshots[version]
+    snap = _snapshot
+    if snap is not None:
+        return snap
+    with _reload_lock:
+        if _snapshot is None:
+            _start_load_locked()
+        carga = _reload_thread
+    carga.join()
+    if _snapshot is None:
+        raise RuntimeError(f"falha ao carregar o dataset: {_reload_error}") from _reload_error
+    return _snapshot
+
+
+def _publish_locked(df):
+    """Monta o snapshot e o torna o atual (chamar com _load_lock)."""
+    global _snapshot, _next_version
+    snap = Snapshot(df, _next_version)
+    _next_version += 1
+    _snapshots[snap.version] = snap
+    for v in sorted(_snapshots)[:-SNAPSHOT_KEEP]:
+        del _snapshots[v]
+    _snapshot = snap  # troca atômica da referência
+
+
+def get_index() -> DatasetIndex:
+    return get_snapshot().index
 
 
 def require_token():
@@ -76,34 +287,185 @@ def _read_csv_robusto(src: str) -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def load_df() -> pd.DataFrame:
-    """Carrega DataFrame (lazy-load)."""
-    global _df_cache
-    if _df_cache is not None:
-        return _df_cache
+def _normalize_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalizações leves e seguras aplicadas ao CSV bruto."""
+    if df.empty:
+        return df
+
+    if "date_purchase" in df.columns:
+        df["date_purchase"] = pd.to_datetime(df["date_purchase"], errors="coerce").astype(str)
+
+    if "gmv_success" in df.columns and df["gmv_success"].dtype == object:
+        # troca vírgula por ponto se vier no padrão PT-BR
+        df["gmv_success"] = pd.to_numeric(
+            df["gmv_success"].astype(str).str.replace(",", ".", regex=False),
+            errors="coerce"
+        )
+
+    if "total_tickets_quantity_success" in df.columns:
+        df["total_tickets_quantity_success"] = pd.to_numeric(
+            df["total_tickets_quantity_success"], errors="coerce"
+        ).astype("Int64")
+
+    return df
+
+
+# =========================
+# Cache colunar do dataset
+# =========================
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _source_fingerprint(src: str):
+    """
+    Identifica o conteúdo atual da fonte sem parsear o CSV:
+      - arquivo local: sha256 (memoizado por tamanho + mtime em fingerprints.json)
+      - URL: ETag ou Last-Modified + Content-Length (HEAD); None se o servidor não informar
+    """
+    if src.startswith(("http://", "https://")):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(src, method="HEAD"), timeout=30) as r:
+                etag = r.headers.get("ETag")
+                modified = r.headers.get("Last-Modified")
+                length = r.headers.get("Content-Length")
+        except Exception as e:
+            app.logger.warning(f"[CACHE] HEAD falhou em {src}: {e}")
+            return None
+        if etag:
+            return f"etag:{etag}"
+        if modified and length:
+            return f"lm:{modified}:{length}"
+        return None
+
+    if not os.path.isfile(src):
+        return None
+    st = os.stat(src)
+    memo_path = os.path.join(CACHE_DIR, "fingerprints.json")
+    try:
+        with open(memo_path, encoding="utf-8") as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = {}
+    key = os.path.abspath(src)
+    hit = memo.get(key)
+    if hit and hit["size"] == st.st_size and hit["mtime_ns"] == st.st_mtime_ns:
+        return f"sha256:{hit['sha256']}"
+
+    digest = _sha256_file(src)
+    memo[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    tmp = f"{memo_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(memo, f)
+    os.replace(tmp, memo_path)
+    return f"sha256:{digest}"
+
+
+def _cache_paths(src: str, fingerprint: str):
+    """(arquivo de cache desta versão da fonte, padrão glob das versões antigas)."""
+    src_key = hashlib.sha1(src.encode("utf-8")).hexdigest()[:12]
+    fp_key = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{src_key}-{fp_key}.arrow"), os.path.join(CACHE_DIR, f"{src_key}-*.arrow")
+
+
+def _read_cache(path: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        # o snapshot é um DataFrame pandas: to_pandas() copia tudo de qualquer jeito, então sem memory-map.
+        # self_destruct libera cada coluna Arrow assim que convertida (pico ~1x, não 2x)
+        table = feather.read_table(path, memory_map=False)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        app.logger.info(f"[CACHE] OK {path} shape={df.shape}")
+        return df
+    except Exception as e:
+        app.logger.warning(f"[CACHE] Ignorando cache ilegível {path}: {e}")
+        return None
+
+
+def _write_cache(path: str, pattern: str, df: pd.DataFrame) -> None:
+    """Grava em Arrow IPC (feather v2, sem compressão: leitura sem descompressão) e remove versões antigas."""
+    try:
+        tmp = f"{path}.tmp"
+        feather.write_feather(df, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+        for old in glob.glob(pattern):
+            if old != path:
+                os.remove(old)
+        app.logger.info(f"[CACHE] Gravado {path}")
+    except Exception as e:
+        app.logger.warning(f"[CACHE] Não foi possível gravar {path}: {e}")
+
 
+def read_dataset() -> pd.DataFrame:
+    """
+    Lê o dataset da fonte. Usa o cache colunar quando a fonte não
+    mudou; senão lê o CSV (caminho robusto), normaliza e regrava o cache.
+    """
     src = CSV_URL or CSV_PATH or "df_t_pequeno.csv"
     app.logger.info(f"Carregando dados de: {src}")
-    df = _read_csv_robusto(src)
 
-    # Normalizações leves e seguras
-    if not df.empty:
-        if "date_purchase" in df.columns:
-            df["date_purchase"] = pd.to_datetime(df["date_purchase"], errors="coerce").astype(str)
+    cache_path = pattern = None
+    if CACHE_DIR and feather is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fingerprint = _source_fingerprint(src)
+        if fingerprint:
+            cache_path, pattern = _cache_paths(src, fingerprint)
+            df = _read_cache(cache_path)
+            if df is not None:
+                return df
+
+    df = _normalize_df(_read_csv_robusto(src))
+    if cache_path and not df.empty:
+        _write_cache(cache_path, pattern, df)
+
+    return df
+
 
-        if "gmv_success" in df.columns and df["gmv_success"].dtype == object:
-            # troca vírgula por ponto se vier no padrão PT-BR
-            df["gmv_success"] = pd.to_numeric(
-                df["gmv_success"].astype(str).str.replace(",", ".", regex=False),
-                errors="coerce"
-            )
+def load_df() -> pd.DataFrame:
+    """DataFrame do snapshot atual (lazy-load)."""
+    return get_snapshot().df
+
+
+def _load_worker():
+    global _reload_error
+    try:
+        df = read_dataset()
+        with _load_lock:
+            _publish_locked(df)
+        _reload_error = None
+        app.logger.info(f"[RELOAD] Publicada versão {_snapshot.version} ({len(df)} linhas)")
+    except Exception as e:
+        _reload_error = e
+        app.logger.error(f"[RELOAD] Falhou, mantendo versão atual: {e}")
 
-        if "total_tickets_quantity_success" in df.columns:
-            df["total_tickets_quantity_success"] = pd.to_numeric(
-                df["total_tickets_quantity_success"], errors="coerce"
-            ).astype("Int64")
 
-    return set_df_cache(df)
+def _start_load_locked() -> bool:
+    """Inicia a thread de carga se nenhuma está rodando (chamar com _reload_lock)."""
+    global _reload_thread
+    if _reload_thread is not None and _reload_thread.is_alive():
+        return False
+    _reload_thread = threading.Thread(target=_load_worker, name="reload", daemon=True)
+    _reload_thread.start()
+    return True
+
+
+def reload_in_background() -> bool:
+    """
+    Monta o próximo snapshot numa thread e publica ao terminar. Enquanto isso
+    os leitores seguem no snapshot atual. False se já havia uma carga em curso.
+    """
+    with _reload_lock:
+        return _start_load_locked()
+
+
+def reload_in_progress() -> bool:
+    return _reload_thread is not None and _reload_thread.is_alive()
 
 
 def coerce_cols(df: pd.DataFrame, cols_param: str) -> pd.DataFrame:
@@ -115,6 +477,325 @@ def coerce_cols(df: pd.DataFrame, cols_param: str) -> pd.DataFrame:
     return df[keep]
 
 
+def int_arg(name: str, default: int = 0) -> int:
+    try:
+        return int(request.args.get(name, default))
+    except ValueError:
+        return default
+
+
+def encode_cursor(last_row, version: int) -> str:
+    """Cursor opaco: posição (rótulo do índice) da última linha entregue + versão do dataset."""
+    raw = json.dumps({"after": int(last_row), "v": int(version)}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Retorna (última linha já entregue, versão); (None, None) = começo. ValueError se inválido."""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        return int(payload["after"]), (int(payload["v"]) if "v" in payload else None)
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+
+class _ChunkSink:
+    """Destino de escrita do pyarrow que entrega o que foi escrito em pedaços."""
+
+    def __init__(self):
+        self._buf = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._buf.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def pop(self) -> bytes:
+        out = b"".join(self._buf)
+        self._buf.clear()
+        return out
+
+
+def iter_columnar(df: pd.DataFrame, fmt: str):
+    """
+    Serializa df em Arrow IPC stream ou Parquet, um record batch (row group) por vez,
+    preservando os dtypes (inclusive Int64 nulável) via metadados do pandas.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, table.schema) if fmt == "arrow" else pq.ParquetWriter(sink, table.schema)
+    try:
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_ROWS):
+            writer.write_batch(batch)
+            chunk = sink.pop()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.pop()
+
+
+def iter_record_chunks(df: pd.DataFrame):
+    """to_dict por blocos de CHUNK_ROWS: nunca materializa todos os dicts de uma vez."""
+    for i in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[i:i + CHUNK_ROWS].to_dict(orient="records")
+
+
+def iter_ndjson(df: pd.DataFrame):
+    for recs in iter_record_chunks(df):
+        yield "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in recs)
+
+
+def iter_json(df: pd.DataFrame, envelope=None):
+    """
+    Array JSON em pedaços (mesma serialização do jsonify). Com `envelope`,
+    gera {"data": [...], <demais chaves>}.
+    """
+    yield '{"data": [' if envelope is not None else "["
+    first = True
+    for recs in iter_record_chunks(df):
+        body = ",".join(app.json.dumps(rec) for rec in recs)
+        yield body if first else "," + body
+        first = False
+    if envelope is None:
+        yield "]"
+    else:
+        yield "]" + "".join(f", {app.json.dumps(k)}: {app.json.dumps(v)}" for k, v in envelope.items()) + "}"
+
+
+def choose_encoding():
+    """Escolhe a codificação pelo Accept-Encoding do cliente (zstd > gzip), ou None."""
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_chunks(chunks, encoding: str):
+    """Comprime pedaço a pedaço (streaming): a resposta inteira nunca fica em memória."""
+    if encoding == "zstd":
+        comp = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # container gzip
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+class ResponseCache:
+    """
+    LRU de respostas já codificadas (e comprimidas) do /dados.
+
+    A chave inclui a versão do snapshot, então um /reload invalida tudo
+    naturalmente: entradas antigas só deixam de ser pedidas e saem pelo LRU.
+    O corpo é guardado enquanto é transmitido; respostas acima de
+    max_entry_bytes (ou interrompidas pelo cliente) não entram.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, max_entry_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._items = OrderedDict()  # chave -> (corpo, mimetype, headers)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_entry_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, key, body: bytes, mimetype: str, headers: dict):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._items[key] = (body, mimetype, headers)
+            self._bytes += len(body)
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (dropped, _, _) = self._items.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def tee(self, key, chunks, mimetype: str, headers: dict):
+        """Repassa os pedaços ao cliente e, se couber, guarda a resposta completa."""
+        parts, size = [], 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, b"".join(parts), mimetype, headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_ENTRIES,
+    int(RESPONSE_CACHE_MB * 1024 * 1024),
+    int(RESPONSE_CACHE_ENTRY_MB * 1024 * 1024),
+)
+
+
+def response_cache_key(version: int, encoding, extra=()):
+    """
+    Consulta normalizada: só os parâmetros que mudam a resposta, com inteiros
+    já convertidos e ?version= resolvido para a versão efetivamente servida.
+    """
+    q = list(extra)
+    for name in ("cliente", "data", "since", "until"):
+        if request.args.get(name):
+            q.append((name, request.args[name]))
+    page_size = int_arg("page_size")
+    if page_size > 0:
+        q.append(("page_size", page_size))
+        if "cursor" not in request.args:
+            q.append(("page", max(int_arg("page", 1), 1)))
+    for name in ("limit", "offset"):
+        if int_arg(name):
+            q.append((name, int_arg(name)))
+    if "cursor" in request.args:
+        q.append(("cursor", request.args["cursor"]))
+    cols = ",".join(c.strip() for c in request.args.get("cols", "").split(",") if c.strip())
+    if cols:
+        q.append(("cols", cols))
+    q.append(("format", request.args.get("format", "json").lower()))
+    return (request.path, version, encoding or "identity", tuple(q))
+
+
+def etag_for(key) -> str:
+    """ETag forte: o snapshot é imutável, então a chave determina o corpo."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def cached_response(cache_key, etag: str, version: int):
+    """304 se o cliente já tem esta versão, a resposta guardada se houver, senão None."""
+    if etag in request.if_none_match:
+        response_cache.count_not_modified()
+        return Response(status=304, headers={
+            "ETag": f'"{etag}"', "Vary": "Accept-Encoding", "X-Dataset-Version": str(version),
+        })
+    if response_cache.enabled:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            body, mimetype, headers = cached
+            return Response(body, mimetype=mimetype, headers={**headers, "ETag": f'"{etag}"'})
+    return None
+
+
+def resolve_snapshot(version=None):
+    """(snapshot, None) ou (None, resposta de erro) para uma versão fixada que já saiu."""
+    try:
+        return get_snapshot(version or None), None
+    except KeyError:
+        return None, (jsonify({"erro": f"versão {version} do dataset não está mais disponível",
+                               "dataset_version": get_snapshot().version}), 410)
+
+
+def filter_rows(idx: DatasetIndex):
+    """Filtros cliente/data/since/until resolvidos pelos índices (None = sem filtro)."""
+    rows = None
+    cliente = request.args.get("cliente")
+    data = request.args.get("data")  # prefixo YYYY-MM
+
+    if cliente and idx.by_client is not None:
+        rows = combine_rows(rows, idx.client_rows(cliente))
+
+    if data and idx.sorted_dates is not None:
+        rows = combine_rows(rows, idx.date_prefix_rows(data))
+
+    # Carga incremental: só registros com date_purchase >= since (ISO, ex.: 2024-03-05)
+    since = request.args.get("since")
+    if since and idx.sorted_dates is not None:
+        rows = combine_rows(rows, idx.since_rows(since))
+
+    until = request.args.get("until")
+    if until and idx.sorted_dates is not None:
+        rows = combine_rows(rows, idx.until_rows(until))
+
+    return rows
+
+
+def frame_response(df: pd.DataFrame, fmt: str, headers: dict, cache_key, envelope=None) -> Response:
+    """Serializa df no formato pedido (json, ndjson, arrow, parquet)."""
+    if fmt == "ndjson":
+        return stream_response(iter_ndjson(df), "application/x-ndjson", headers, cache_key)
+
+    if fmt in COLUMNAR_MIMETYPES:
+        if pa is None:
+            return jsonify({"erro": f"format={fmt} requer pyarrow no servidor"}), 501
+        return stream_response(iter_columnar(df, fmt), COLUMNAR_MIMETYPES[fmt], headers, cache_key)
+
+    return stream_response(iter_json(df, envelope), "application/json", headers, cache_key)
+
+
+def stream_response(chunks, mimetype: str, headers: dict, cache_key=None) -> Response:
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    encoding = choose_encoding()
+    if encoding:
+        chunks = compress_chunks(chunks, encoding)
+        headers["Content-Encoding"] = encoding
+    if cache_key is not None and response_cache.enabled:
+        chunks = response_cache.tee(cache_key, chunks, mimetype, headers)
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+
 # =========================
 # Rotas
 # =========================
@@ -126,8 +807,16 @@ def root():
 @app.route("/health")
 def health():
     try:
-        df = load_df()
-        return jsonify({"status": "ok", "rows": int(len(df))})
+        snap = get_snapshot()
+        return jsonify({
+            "status": "ok",
+            "rows": int(len(snap.df)),
+            "dataset_version": snap.version,
+            "loaded_at": snap.loaded_at,
+            "versions_available": sorted(_snapshots),
+            "reloading": reload_in_progress(),
+            "response_cache": response_cache.stats(),
+        })
     except Exception as e:
         return jsonify({"status": "error", "detail": str(e)}), 500
 
@@ -164,56 +853,162 @@ def dados():
     if DELAY:
         time.sleep(DELAY)
 
-    df = load_df().copy()
-
-    # Filtros
-    cliente = request.args.get("cliente")
-    data = request.args.get("data")  # prefixo YYYY-MM
-
-    if cliente and "fk_contact" in df.columns:
-        df = df[df["fk_contact"].astype(str) == str(cliente)]
-
-    if data and "date_purchase" in df.columns:
-        df = df[df["date_purchase"].str.startswith(data)]
-
-    # Seleção de colunas
+    # Versão fixada: ?version=N ou a versão embutida no cursor
+    try:
+        after, cursor_version = decode_cursor(request.args.get("cursor", ""))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    snap, erro = resolve_snapshot(int_arg("version", 0) or cursor_version)
+    if erro:
+        return erro
+    df, idx = snap.df, snap.index
+
+    # Cache de respostas: mesma consulta normalizada + mesma versão = mesmo corpo
+    cache_key = response_cache_key(snap.version, choose_encoding())
+    etag = etag_for(cache_key)
+    cached = cached_response(cache_key, etag, snap.version)
+    if cached is not None:
+        return cached
+
+    # Filtros: resolvidos pelos índices em posições de linha (None = sem filtro)
+    rows = filter_rows(idx)
+
+    # Paginação (sempre por fatia posicional: custo proporcional à página)
+    #  - cursor=<token>     : keyset pela posição da linha no dataset (índice estável)
+    #  - page / page_size   : página 1-based
+    #  - limit / offset     : compatibilidade
+    total_rows = len(df) if rows is None else len(rows)
+    page_size = int_arg("page_size")
+    limit = int_arg("limit")
+    next_cursor = None
+    start, end = 0, total_rows
+
+    if "cursor" in request.args:
+        size = page_size or limit or DEFAULT_PAGE_SIZE
+        if after is not None:
+            start = after + 1 if rows is None else int(np.searchsorted(rows, after, side="right"))
+        end = start + size
+    elif page_size > 0:
+        start = (max(int_arg("page", 1), 1) - 1) * page_size
+        end = start + page_size
+    else:
+        start = max(int_arg("offset"), 0)
+        if limit > 0:
+            end = start + limit
+
+    start, end = min(start, total_rows), min(end, total_rows)
+    df = df.iloc[start:end] if rows is None else df.iloc[rows[start:end]]
+    if "cursor" in request.args and len(df) and end < total_rows:
+        next_cursor = encode_cursor(df.index[-1], snap.version)
+
+    # Seleção de colunas (depois da paginação, para não copiar o dataset inteiro)
     cols = request.args.get("cols")
     if cols:
         df = coerce_cols(df, cols)
 
-    # Paginação
-    try:
-        limit = int(request.args.get("limit", "0"))
-    except ValueError:
-        limit = 0
-    try:
-        offset = int(request.args.get("offset", "0"))
-    except ValueError:
-        offset = 0
-
-    if offset > 0:
-        df = df.iloc[offset:]
-    if limit > 0:
-        df = df.iloc[:limit]
+    headers = {"X-Dataset-Version": str(snap.version), "ETag": f'"{etag}"'}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
 
     # Formatos
     fmt = request.args.get("format", "json").lower()
-    if fmt == "ndjson":
-        def gen():
-            for rec in df.to_dict(orient="records"):
-                yield json.dumps(rec, ensure_ascii=False) + "\n"
-        return Response(gen(), mimetype="application/x-ndjson")
+    envelope = {"next_cursor": next_cursor, "dataset_version": snap.version} if "cursor" in request.args else None
+    return frame_response(df, fmt, headers, cache_key, envelope)
+
+
+def split_arg(name: str, default: str = ""):
+    return [p.strip() for p in request.args.get(name, default).split(",") if p.strip()]
+
+
+@app.route("/aggregates", methods=["GET"])
+def aggregates():
+    """
+    Tabela agregada sobre o snapshot em memória, para quem só precisa de groupby.
+
+    Parâmetros:
+      by      : chaves separadas por vírgula (day, month, weekday, hour, origin,
+                destination, bus_company); vazio = total geral
+      metrics : medidas (gmv, tickets, count, clients); padrão = todas
+      sort    : medida para ordenar em ordem decrescente (padrão: pelas chaves)
+      top     : mantém só os N primeiros grupos após a ordenação
+      cliente, data, since, until, version, format : como no /dados
+    """
+    if not require_token():
+        return jsonify({"erro": "Acesso não autorizado"}), 401
+    if DELAY:
+        time.sleep(DELAY)
 
-    return jsonify(df.to_dict(orient="records"))
+    by = split_arg("by")
+    metrics = split_arg("metrics", ",".join(MEASURES))
+    sort = request.args.get("sort", "")
+    top = int_arg("top")
+
+    invalidos = [k for k in by if k not in GROUP_KEYS] + [m for m in metrics if m not in MEASURES]
+    if sort and sort not in metrics:
+        invalidos.append(sort)
+    if invalidos:
+        return jsonify({"erro": f"parâmetros inválidos: {', '.join(invalidos)}",
+                        "by": list(GROUP_KEYS), "metrics": list(MEASURES)}), 400
+
+    snap, erro = resolve_snapshot(int_arg("version", 0))
+    if erro:
+        return erro
+
+    cache_key = response_cache_key(snap.version, choose_encoding(),
+                                   extra=[("by", tuple(by)), ("metrics", tuple(metrics)), ("sort", sort), ("top", top)])
+    etag = etag_for(cache_key)
+    cached = cached_response(cache_key, etag, snap.version)
+    if cached is not None:
+        return cached
+
+    faltando = sorted(({GROUP_KEYS[k][0] for k in by} | {MEASURES[m][0] for m in metrics if MEASURES[m][0]})
+                      - set(snap.df.columns))
+    if faltando:
+        return jsonify({"erro": f"colunas ausentes no dataset: {', '.join(faltando)}"}), 400
+
+    # Só as colunas necessárias, só nas linhas filtradas
+    rows = filter_rows(snap.index)
+    keys = [snap.group_key(k) for k in by]
+    value_cols = sorted({MEASURES[m][0] for m in metrics if MEASURES[m][0]})
+    parts = keys + [snap.df[c] for c in value_cols]
+    frame = pd.concat(parts, axis=1) if parts else pd.DataFrame(index=snap.df.index)
+    if rows is not None:
+        frame = frame.iloc[rows]
+
+    if by:
+        named = {m: (MEASURES[m][0] or by[0], MEASURES[m][1]) for m in metrics}
+        out = frame.groupby(by, sort=True, dropna=False, observed=True).agg(**named).reset_index()
+    else:
+        out = pd.DataFrame({m: [len(frame) if fn == "size" else frame[col].agg(fn)]
+                            for m, (col, fn) in ((m, MEASURES[m]) for m in metrics)})
+
+    if sort:
+        out = out.sort_values(sort, ascending=False, kind="stable")
+    if top > 0:
+        out = out.head(top)
+    out = out.reset_index(drop=True)
+
+    headers = {"X-Dataset-Version": str(snap.version), "ETag": f'"{etag}"', "X-Groups": str(len(out))}
+    return frame_response(out, request.args.get("format", "json").lower(), headers, cache_key)
 
 
 @app.route("/reload", methods=["POST"])
 def reload():
     if not require_token():
         return jsonify({"erro": "Acesso não autorizado"}), 401
-    set_df_cache(None)
-    load_df()
-    return jsonify({"status": "ok", "msg": "Dados recarregados"})
+    # servidor frio: não carrega o dataset aqui para logo recarregá-lo; só o reload em background
+    snap = _snapshot
+    atual = snap.version if snap is not None else None
+    iniciou = reload_in_background()
+    if request.args.get("wait") in ("1", "true"):
+        _reload_thread.join()
+        snap = get_snapshot()
+        return jsonify({"status": "ok", "msg": "Dados recarregados", "dataset_version": snap.version})
+    return jsonify({
+        "status": "accepted",
+        "msg": "Recarga iniciada em background" if iniciou else "Recarga já em andamento",
+        "dataset_version": atual,
+    }), 202
 
 
 # =========================
@@ -0,0 +1,98 @@
+# bench_encodings.py
+"""
+Benchmark das codificações de /dados: bytes na rede e tempo ponta a ponta por página.
+
+Sobe a API localmente (werkzeug, em thread) e, para cada formato (json,
+ndjson, arrow) e cada Accept-Encoding (identity, gzip, zstd), busca as
+páginas via HTTP, mede os bytes recebidos e o tempo até os registros
+estarem decodificados no cliente.
+
+Uso:
+  CSV_PATH=df_t.csv python bench_encodings.py [page_size] [paginas]
+"""
+import io
+import sys
+import json
+import time
+import zlib
+import threading
+
+import requests
+from werkzeug.serving import make_server
+
+import api_fake
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PORT = 5099
+
+
+def decompress(raw: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    return raw
+
+
+def parse(body: bytes, fmt: str) -> int:
+    if fmt == "json":
+        return len(json.loads(body))
+    if fmt == "ndjson":
+        return sum(1 for line in body.splitlines() if line and json.loads(line) is not None)
+    return pa.ipc.open_stream(io.BytesIO(body)).read_all().num_rows
+
+
+def fetch(session, fmt, encoding, page, page_size):
+    params = {"page": page, "page_size": page_size, "format": fmt}
+    t0 = time.perf_counter()
+    r = session.get(f"http://127.0.0.1:{PORT}/dados", params=params,
+                    headers={"Accept-Encoding": encoding}, stream=True, timeout=120)
+    r.raise_for_status()
+    raw = r.raw.read(decode_content=False)
+    got = r.headers.get("Content-Encoding", "identity")
+    rows = parse(decompress(raw, got), fmt)
+    return len(raw), time.perf_counter() - t0, rows, got
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    df = api_fake.load_df()
+    print(f"→ {len(df)} linhas; page_size={page_size}; {pages} página(s) por combinação")
+
+    srv = make_server("127.0.0.1", PORT, api_fake.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    formats = ["json", "ndjson"] + (["arrow"] if pa is not None else [])
+    encodings = ["identity", "gzip"] + (["zstd"] if zstandard is not None else [])
+    session = requests.Session()
+    session.headers["x-api-key"] = api_fake.API_KEY
+
+    print(f"{'formato':<8} {'encoding':<9} {'bytes/página':>14} {'ms/página':>10} {'linhas':>8}")
+    try:
+        for fmt in formats:
+            for enc in encodings:
+                tot_bytes = tot_time = tot_rows = 0
+                for page in range(1, pages + 1):
+                    n, dt, rows, got = fetch(session, fmt, enc, page, page_size)
+                    assert got == enc, f"servidor respondeu {got} para {enc}"
+                    tot_bytes += n
+                    tot_time += dt
+                    tot_rows += rows
+                print(f"{fmt:<8} {enc:<9} {tot_bytes / pages:>14,.0f} {1000 * tot_time / pages:>10.1f} {tot_rows:>8}")
+    finally:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_lookups.py
+"""
+Benchmark dos filtros do /dados: varredura completa (como era) x índices do load_df().
+
+Mede consultas por segundo para buscas de um único cliente e de um mês,
+conferindo que as duas formas retornam as mesmas linhas.
+
+Uso:
+  CSV_PATH=df_t.csv python bench_lookups.py [consultas]
+"""
+import sys
+import time
+import random
+
+import api_fake
+
+
+def antes_cliente(df, cliente):
+    df = df.copy()
+    return df[df["fk_contact"].astype(str) == str(cliente)]
+
+
+def antes_mes(df, mes):
+    df = df.copy()
+    return df[df["date_purchase"].str.startswith(mes)]
+
+
+def depois_cliente(df, idx, cliente):
+    return df.iloc[idx.client_rows(cliente)]
+
+
+def depois_mes(df, idx, mes):
+    return df.iloc[idx.date_prefix_rows(mes)]
+
+
+def medir(label, fn, args_list):
+    t0 = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    dt = time.perf_counter() - t0
+    print(f"  {label:<28} {len(args_list) / dt:12.1f} consultas/s")
+    return dt
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    t0 = time.perf_counter()
+    df = api_fake.load_df()
+    idx = api_fake.get_index()
+    print(f"→ {len(df)} linhas carregadas + índices em {time.perf_counter() - t0:.2f}s")
+
+    rnd = random.Random(42)
+    clientes = rnd.choices(list(idx.by_client), k=n)
+    meses = rnd.choices(list(idx.month_bounds), k=n)
+
+    for c in clientes[:20]:
+        assert antes_cliente(df, c).index.equals(depois_cliente(df, idx, c).index)
+    for m in meses[:5]:
+        assert antes_mes(df, m).index.equals(depois_mes(df, idx, m).index)
+
+    print("Cliente único:")
+    a = medir("antes (copy + astype + ==)", antes_cliente, [(df, c) for c in clientes])
+    d = medir("depois (índice)", depois_cliente, [(df, idx, c) for c in clientes])
+    print(f"  speedup: {a / d:.1f}x")
+
+    print("Mês (data=YYYY-MM):")
+    a = medir("antes (copy + startswith)", antes_mes, [(df, m) for m in meses])
+    d = medir("depois (índice)", depois_mes, [(df, idx, m) for m in meses])
+    print(f"  speedup: {a / d:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark: cast_value (célula a célula) x plano de conversão por coluna.
+
+Gera uma página sintética de 100k linhas com o schema real da tabela core
+(tipos como o create_table.py os cria a partir do /schema) e mede as duas
+formas de converter, conferindo que o resultado é o mesmo.
+
+Uso:
+  python DATABASE/bench_converters.py [linhas]
+"""
+
+import os
+import sys
+import time
+import random
+
+# data_ingestion exige o .env; para o benchmark basta qualquer valor
+for k in ("API_BASE", "API_TOKEN", "PG_DSN", "TABLE_NAME"):
+    os.environ.setdefault(k, "bench")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from data_ingestion import cast_value, build_converter_plan, convert_page  # noqa: E402
+
+# information_schema.columns.data_type da tabela core
+TYPES = {
+    "nk_ota_localizer_id": "text",
+    "fk_contact": "text",
+    "date_purchase": "text",
+    "time_purchase": "text",
+    "place_origin_departure": "text",
+    "place_destination_departure": "text",
+    "place_origin_return": "text",
+    "place_destination_return": "text",
+    "fk_departure_ota_bus_company": "text",
+    "fk_return_ota_bus_company": "text",
+    "gmv_success": "double precision",
+    "total_tickets_quantity_success": "bigint",
+}
+COLS = list(TYPES)
+
+
+def make_page(n: int, numeros_como_texto: bool):
+    rnd = random.Random(42)
+    page = []
+    for _ in range(n):
+        gmv = round(rnd.uniform(20, 900), 2)
+        tickets = rnd.randint(1, 6)
+        page.append({
+            "nk_ota_localizer_id": "%064x" % rnd.getrandbits(256),
+            "fk_contact": "%064x" % rnd.getrandbits(256),
+            "date_purchase": f"2023-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "time_purchase": f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}",
+            "place_origin_departure": f"Cidade_{rnd.randint(1, 500)}",
+            "place_destination_departure": f"Cidade_{rnd.randint(1, 500)}",
+            "place_origin_return": "0",
+            "place_destination_return": "0",
+            "fk_departure_ota_bus_company": f"{rnd.getrandbits(64):016x}",
+            "fk_return_ota_bus_company": "1",
+            "gmv_success": f"{gmv:.2f}".replace(".", ",") if numeros_como_texto else gmv,
+            "total_tickets_quantity_success": str(tickets) if numeros_como_texto else tickets,
+        })
+    return page
+
+
+def bench(label: str, page) -> None:
+    t0 = time.perf_counter()
+    esperado = [tuple(cast_value(row.get(c), TYPES[c]) for c in COLS) for row in page]
+    t_cast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    plan = build_converter_plan(COLS, TYPES)
+    obtido, falhas = convert_page(plan, page)
+    t_plan = time.perf_counter() - t0
+
+    iguais = obtido == esperado
+    print(f"{label:<22} cast_value: {t_cast:7.3f}s | plano: {t_plan:7.3f}s | "
+          f"speedup: {t_cast / t_plan:5.1f}x | iguais: {iguais} | falhas: {falhas or '-'}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"→ Página de {n} linhas, {len(COLS)} colunas")
+    bench("JSON nativo", make_page(n, numeros_como_texto=False))
+    bench("números como texto", make_page(n, numeros_como_texto=True))
+
+
+if __name__ == "__main__":
+    main()
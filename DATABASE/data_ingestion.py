@@ -1,12 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, sys, requests
-from typing import List, Dict, Any, Iterable, Tuple
+import os, io, sys, json, time, queue, argparse, threading, requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+from urllib3.util.request import ACCEPT_ENCODING
+from typing import List, Dict, Any, Iterable, Tuple, Optional, Callable
 from decimal import Decimal
+import pandas as pd
 from dotenv import load_dotenv
 from psycopg import connect
 from psycopg.rows import dict_row
+from ingest_metrics import IngestMetrics, write_json_report, write_prometheus_textfile
+
+try:
+    import zstandard  # respostas zstd quando o urllib3 não as decodifica sozinho
+except ImportError:
+    zstandard = None
+
+URLLIB3_ZSTD = "zstd" in HTTPResponse.CONTENT_DECODERS
+_ENCODING_PADRAO = ACCEPT_ENCODING if URLLIB3_ZSTD or zstandard is None else "zstd," + ACCEPT_ENCODING
 
 load_dotenv()
 
@@ -16,9 +31,21 @@ PG_DSN      = os.getenv("PG_DSN")
 TABLE_NAME  = os.getenv("TABLE_NAME")                 # ex: clickbus_projetods
 SCHEMA      = os.getenv("SCHEMA_TARGET", "core")      # padrão: core
 PAGE_SIZE   = int(os.getenv("PAGE_SIZE", "5000"))
+INGEST_MODE = os.getenv("INGEST_MODE", "row").lower() # row (INSERT por linha) | copy (COPY por página) | incremental (upsert desde o watermark)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "1"))  # páginas em voo simultâneo (1 = serial)
+FETCH_QUEUE   = int(os.getenv("FETCH_QUEUE", "4"))    # páginas prontas aguardando o writer
+FETCH_FORMAT  = os.getenv("FETCH_FORMAT", "json").lower()  # json | ndjson | arrow (ndjson e arrow em streaming)
+FETCH_ENCODING = os.getenv("FETCH_ENCODING", _ENCODING_PADRAO)  # compressões aceitas (zstd entra se urllib3 ou zstandard decodificam)
+BATCH_SIZE    = int(os.getenv("BATCH_SIZE", "1000"))   # micro-lote entregue ao writer no modo ndjson (no arrow: um record batch)
 
 if not (API_BASE and API_KEY and PG_DSN and TABLE_NAME):
     raise SystemExit("Faltam variáveis no .env: API_BASE, API_TOKEN, PG_DSN, TABLE_NAME")
+if INGEST_MODE not in ("row", "copy", "incremental"):
+    raise SystemExit(f"INGEST_MODE inválido: {INGEST_MODE!r} (use 'row', 'copy' ou 'incremental')")
+if FETCH_FORMAT not in ("json", "ndjson", "arrow"):
+    raise SystemExit(f"FETCH_FORMAT inválido: {FETCH_FORMAT!r} (use 'json', 'ndjson' ou 'arrow')")
+if "zstd" in FETCH_ENCODING.lower() and not (URLLIB3_ZSTD or zstandard):
+    raise SystemExit("FETCH_ENCODING com zstd requer o pacote zstandard (ou um urllib3 com suporte a zstd).")
 
 HEADERS = {"x-api-key": API_KEY}
 
@@ -42,6 +69,9 @@ def normalize_number_str(s: str) -> str:
         return s.replace(",", ".")
     return s
 
+# representações de data ausente vindas do pandas (NaT) ou de CSV
+_DATA_NULA = {"NaT", "nat", "NaN", "nan", "None"}
+
 def cast_value(value: Any, pg_type: str):
     if value is None:
         return None
@@ -74,13 +104,150 @@ def cast_value(value: Any, pg_type: str):
             return bool(int(s))
 
         if "timestamp" in t or t.startswith("date") or t.startswith("time"):
-            return s
+            return None if s in _DATA_NULA else s
 
         return s
 
     except Exception:
         return value
 
+# --------------------------
+# Plano de conversão por coluna (vetorizado)
+# --------------------------
+# Mesma semântica de cast_value, mas montado uma vez a partir dos tipos da
+# tabela e aplicado coluna a coluna na página inteira. Valores que não
+# convertem seguem como vieram (o banco rejeita e o erro é isolado) e são
+# contados por coluna.
+
+_TRUE  = {"true", "t", "1", "yes", "y", "sim"}
+_FALSE = {"false", "f", "0", "no", "n", "nao", "não"}
+_NATIVOS = {"integer", "floating", "mixed-integer-float", "decimal", "boolean"}
+try:
+    import pyarrow as pa  # strings em Arrow: operações .str bem mais rápidas
+    _STR = "string[pyarrow]"
+except ImportError:
+    pa = None
+    _STR = "string"
+
+if FETCH_FORMAT == "arrow" and pa is None:
+    raise SystemExit("FETCH_FORMAT=arrow requer pyarrow instalado.")
+
+Converter = Callable[[pd.Series], Tuple[pd.Series, pd.Series]]  # -> (convertida, máscara de falhas)
+
+def _texto(s: pd.Series) -> pd.Series:
+    """str(v).strip() vetorizado; vazio vira NA."""
+    txt = s.astype(_STR).str.strip()
+    return txt.mask(txt == "")
+
+def _sem_falhas(s: pd.Series) -> pd.Series:
+    return pd.Series(False, index=s.index)
+
+def _normalize_number_series(txt: pd.Series) -> pd.Series:
+    """normalize_number_str vetorizado (pt-BR / en-US)."""
+    has_c = txt.str.contains(",", regex=False).fillna(False)
+    has_d = txt.str.contains(".", regex=False).fillna(False)
+    pt_br = has_c & has_d & (txt.str.rfind(",") > txt.str.rfind(".")).fillna(False)
+    en_us = has_c & has_d & ~pt_br
+    so_virgula = has_c & ~has_d
+    out = txt.mask(pt_br, txt.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    out = out.mask(en_us, txt.str.replace(",", "", regex=False))
+    return out.mask(so_virgula, txt.str.replace(",", ".", regex=False))
+
+def _com_fallback(conv: Callable[[pd.Series], Tuple[pd.Series, pd.Series]], pg_type: str) -> Converter:
+    """Números nativos passam direto; colunas com tipos misturados caem no cast_value."""
+    def aplicar(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        kind = pd.api.types.infer_dtype(s, skipna=True)
+        if kind in _NATIVOS:
+            return s, _sem_falhas(s)
+        if kind in ("string", "empty"):
+            return conv(s)
+        out = s.map(lambda v: cast_value(v, pg_type))
+        # falha: valor não vazio que virou nulo ou que o cast_value devolveu como texto
+        falhas = ((out.isna() | out.map(lambda v: isinstance(v, str))) & _texto(s).notna()).fillna(False)
+        return out, falhas
+    return aplicar
+
+def _conv_int(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    txt = _texto(s)
+    limpo = txt.str.replace(r"[^0-9+-]", "", regex=True)
+    limpo = limpo.mask(limpo == "")
+    out = pd.to_numeric(limpo, errors="coerce", dtype_backend="numpy_nullable")
+    falhas = (limpo.notna() & out.isna()).fillna(False)
+    return out.astype(object).where(~falhas, s), falhas
+
+def _conv_float(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    txt = _normalize_number_series(_texto(s))
+    out = pd.to_numeric(txt, errors="coerce").astype("Float64")
+    falhas = (txt.notna() & out.isna()).fillna(False)
+    return out.astype(object).where(~falhas, s), falhas
+
+def _conv_numeric(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    # COPY/INSERT recebem o texto normalizado e o Postgres converte sem perda (como Decimal)
+    txt = _normalize_number_series(_texto(s))
+    falhas = (txt.notna() & pd.to_numeric(txt, errors="coerce").isna()).fillna(False)
+    return txt.astype(object).where(~falhas, s), falhas
+
+def _conv_bool(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    txt = _texto(s)
+    low = txt.str.lower()
+    num = pd.to_numeric(txt.where(txt.str.fullmatch(r"[+-]?\d+").fillna(False)), errors="coerce")
+    out = pd.Series(pd.NA, index=s.index, dtype="boolean")
+    out = out.mask(num.notna(), num != 0)
+    out = out.mask(low.isin(_FALSE).fillna(False), False)
+    out = out.mask(low.isin(_TRUE).fillna(False), True)
+    falhas = (txt.notna() & out.isna()).fillna(False)
+    return out.astype(object).where(~falhas, s), falhas
+
+def _conv_text(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    return _texto(s), _sem_falhas(s)
+
+def _conv_date(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    # a API serializa datas ausentes como "NaT"; em coluna DATE isso vira NULL
+    txt = _texto(s)
+    return txt.mask(txt.isin(_DATA_NULA).fillna(False)), _sem_falhas(s)
+
+def converter_for(pg_type: str) -> Converter:
+    t = (pg_type or "").lower()
+    if t in ("bigint", "integer", "smallint"):
+        return _com_fallback(_conv_int, t)
+    if t in ("numeric", "decimal"):
+        return _com_fallback(_conv_numeric, t)
+    if t in ("double precision", "real"):
+        return _com_fallback(_conv_float, t)
+    if t == "boolean":
+        return _com_fallback(_conv_bool, t)
+    if "timestamp" in t or t.startswith("date") or t.startswith("time"):
+        return _com_fallback(_conv_date, t)
+    return _com_fallback(_conv_text, t)
+
+def build_converter_plan(cols: List[str], types: Dict[str, str]) -> List[Tuple[str, Converter]]:
+    """Um conversor especializado por coluna, montado uma vez a partir de get_table_columns()."""
+    return [(c, converter_for(types.get(c, ""))) for c in cols]
+
+def convert_page(plan: List[Tuple[str, Converter]], batch) -> Tuple[List[Tuple], Dict[str, int]]:
+    """
+    Converte uma página inteira coluna a coluna. `batch` é uma lista de dicts
+    (JSON/NDJSON) ou uma Pagina com `frame` (Arrow, já tipado).
+    Retorna (linhas como tuplas na ordem do plano, {coluna: falhas de conversão}).
+    """
+    if not len(batch):
+        return [], {}
+    cols = [c for c, _ in plan]
+    frame = getattr(batch, "frame", None)
+    if frame is not None:
+        df = frame.reindex(columns=cols)
+    else:
+        df = pd.DataFrame(batch, columns=cols, dtype=object)  # object: mantém os tipos nativos do JSON
+    valores, falhas = [], {}
+    for c, conv in plan:
+        out, erro = conv(df[c])
+        n = int(erro.sum())
+        if n:
+            falhas[c] = n
+        out = out.astype(object)
+        valores.append(out.where(out.notna(), None).tolist())
+    return list(zip(*valores)), falhas
+
 # --------------------------
 # Descobrir colunas da tabela
 # --------------------------
@@ -105,22 +272,261 @@ def get_table_columns(conn) -> Tuple[List[str], set, Dict[str, str]]:
     return cols, identity, types
 
 # --------------------------
-# API (paginação simples)
+# API (paginação)
 # --------------------------
 
-def fetch_dados() -> Iterable[List[Dict[str, Any]]]:
-    page = 1
-    while True:
-        params = {"page": page, "page_size": PAGE_SIZE}
-        r = requests.get(f"{API_BASE}/dados", headers=HEADERS, params=params, timeout=120)
+def make_session(pool_size: int = 1) -> requests.Session:
+    """Sessão HTTP com pool de conexões keep-alive (uma por worker)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    session.headers["Accept-Encoding"] = FETCH_ENCODING
+    return session
+
+def _zstd_manual(r: requests.Response) -> bool:
+    """Corpo em zstd que o urllib3 não sabe descomprimir: fica por conta do zstandard."""
+    return not URLLIB3_ZSTD and r.headers.get("Content-Encoding", "").strip().lower() == "zstd"
+
+def corpo_stream(r: requests.Response):
+    """Arquivo com o corpo já descomprimido de uma resposta stream=True."""
+    if _zstd_manual(r):
+        r.raw.decode_content = False
+        return zstandard.ZstdDecompressor().stream_reader(r.raw)
+    r.raw.decode_content = True
+    return r.raw
+
+def corpo_linhas(r: requests.Response) -> Iterable[bytes]:
+    """Linhas do corpo (stream=True), descomprimidas conforme chegam."""
+    if _zstd_manual(r):
+        return io.BufferedReader(corpo_stream(r))
+    return r.iter_lines()
+
+def corpo_json(r: requests.Response) -> Any:
+    if _zstd_manual(r):
+        return json.loads(zstandard.ZstdDecompressor().decompressobj().decompress(r.content))
+    return r.json()
+
+class Pagina(list):
+    """
+    Registros de uma página (ou micro-lote) + tempos de http/decode medidos no fetch.
+    No formato arrow os registros não viram dicts: ficam em `frame` (DataFrame tipado).
+    """
+    def __init__(self, data: Iterable[Dict[str, Any]] = (), http: float = 0.0, decode: float = 0.0,
+                 frame: Optional[pd.DataFrame] = None):
+        super().__init__(data)
+        self.frame = frame
+        self.tempos = {"http": http, "decode": decode}
+
+    def __len__(self) -> int:
+        return len(self.frame) if self.frame is not None else super().__len__()
+
+# dtypes nuláveis: inteiros com nulos não viram float (o COPY rejeitaria "3.0" num BIGINT)
+_ARROW_TO_PANDAS = {
+    "int8": pd.Int8Dtype(), "int16": pd.Int16Dtype(), "int32": pd.Int32Dtype(), "int64": pd.Int64Dtype(),
+    "uint8": pd.UInt8Dtype(), "uint16": pd.UInt16Dtype(), "uint32": pd.UInt32Dtype(), "uint64": pd.UInt64Dtype(),
+    "bool": pd.BooleanDtype(),
+}
+
+def fetch_page_arrow(session: requests.Session, page: int, filtros: Optional[Dict[str, Any]] = None) -> Iterable[Pagina]:
+    """Lê uma página em Arrow IPC stream, entregando um micro-lote por record batch."""
+    params = {**(filtros or {}), "page": page, "page_size": PAGE_SIZE, "format": "arrow"}
+    t0 = time.perf_counter()
+    with session.get(f"{API_BASE}/dados", params=params, timeout=120, stream=True) as r:
         r.raise_for_status()
-        data = r.json()
-        if not data:
-            break
-        if not isinstance(data, list):
-            raise SystemExit(f"/dados retornou formato inesperado (esperado lista). Página {page}.")
-        yield data
-        page += 1
+        reader = pa.ipc.open_stream(corpo_stream(r))
+        while True:
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                break
+            t1 = time.perf_counter()
+            frame = batch.to_pandas(types_mapper=lambda t: _ARROW_TO_PANDAS.get(str(t)))
+            t2 = time.perf_counter()
+            yield Pagina(http=t1 - t0, decode=t2 - t1, frame=frame)
+            t0 = time.perf_counter()
+
+def fetch_page_stream(session: requests.Session, page: int, filtros: Optional[Dict[str, Any]] = None) -> Iterable[Pagina]:
+    """
+    Lê uma página em NDJSON com stream=True e entrega micro-lotes de
+    BATCH_SIZE registros. O pico de memória depende de BATCH_SIZE, não de PAGE_SIZE.
+    """
+    if FETCH_FORMAT == "arrow":
+        yield from fetch_page_arrow(session, page, filtros)
+        return
+
+    params = {**(filtros or {}), "page": page, "page_size": PAGE_SIZE, "format": "ndjson"}
+    t0 = time.perf_counter()
+    decode = 0.0
+    with session.get(f"{API_BASE}/dados", params=params, timeout=120, stream=True) as r:
+        r.raise_for_status()
+        lote: List[Dict[str, Any]] = []
+        for line in corpo_linhas(r):
+            line = line.strip()
+            if not line:
+                continue
+            d0 = time.perf_counter()
+            lote.append(json.loads(line))
+            decode += time.perf_counter() - d0
+            if len(lote) >= BATCH_SIZE:
+                yield Pagina(lote, http=time.perf_counter() - t0 - decode, decode=decode)
+                lote, decode, t0 = [], 0.0, time.perf_counter()
+        if lote:
+            yield Pagina(lote, http=time.perf_counter() - t0 - decode, decode=decode)
+
+def fetch_page(session: requests.Session, page: int, filtros: Optional[Dict[str, Any]] = None) -> Pagina:
+    """Página inteira em JSON (ndjson/arrow vão por fetch_page_stream, em micro-lotes)."""
+    params = {**(filtros or {}), "page": page, "page_size": PAGE_SIZE}
+    t0 = time.perf_counter()
+    r = session.get(f"{API_BASE}/dados", params=params, timeout=120)
+    r.raise_for_status()
+    t1 = time.perf_counter()
+    data = corpo_json(r)
+    t2 = time.perf_counter()
+    if not data:
+        return Pagina()
+    if not isinstance(data, list):
+        raise SystemExit(f"/dados retornou formato inesperado (esperado lista). Página {page}.")
+    return Pagina(data, http=t1 - t0, decode=t2 - t1)
+
+def fetch_dados(filtros: Optional[Dict[str, Any]] = None, page_start: int = 1, page_step: int = 1) -> Iterable[Pagina]:
+    """
+    Itera as páginas de /dados; `filtros` vai junto em cada requisição (ex.: {"since": ...}).
+    `page_start`/`page_step` permitem que cada worker leia uma fatia intercalada das páginas.
+    """
+    if FETCH_WORKERS > 1:
+        yield from fetch_dados_pipeline(FETCH_WORKERS, FETCH_QUEUE, filtros, page_start, page_step)
+        return
+
+    with make_session() as session:
+        page = page_start
+        if FETCH_FORMAT in ("ndjson", "arrow"):
+            while True:
+                vazia = True
+                for lote in fetch_page_stream(session, page, filtros):
+                    vazia = False
+                    yield lote
+                if vazia:
+                    break
+                page += page_step
+            return
+
+        while True:
+            data = fetch_page(session, page, filtros)
+            if not data:
+                break
+            yield data
+            page += page_step
+
+_FIM = object()  # sentinela: não há mais páginas
+
+def fetch_dados_pipeline(workers: int, queue_size: int, filtros: Optional[Dict[str, Any]] = None,
+                         page_start: int = 1, page_step: int = 1) -> Iterable[Pagina]:
+    """
+    Busca páginas com `workers` requisições em voo e entrega em ordem.
+    As páginas prontas vão para uma fila limitada (`queue_size`): quando o
+    writer do banco atrasa, a fila enche e o produtor para de disparar
+    novas requisições (backpressure). Assim rede e INSERT se sobrepõem.
+
+    Em ndjson/arrow o que circula são os micro-lotes do stream, não páginas:
+    cada página em voo tem sua própria fila de até `queue_size` micro-lotes
+    e, cheia, para de ler da conexão. O pico de memória segue dependendo de
+    BATCH_SIZE (× workers × queue_size), não de PAGE_SIZE.
+    """
+    fila: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+    parar = threading.Event()      # o consumidor saiu
+    descartar = threading.Event()  # o produtor terminou: páginas ainda em voo são abandonadas
+
+    def entregar(destino: "queue.Queue[Any]", item, *eventos: threading.Event) -> bool:
+        while not any(e.is_set() for e in (parar,) + eventos):
+            try:
+                destino.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def ler_pagina(session: requests.Session, page: int, lotes: "queue.Queue[Any]") -> None:
+        try:
+            for lote in fetch_page_stream(session, page, filtros):
+                if not entregar(lotes, lote, descartar):
+                    return
+        except BaseException as e:
+            entregar(lotes, e, descartar)
+            return
+        entregar(lotes, _FIM, descartar)
+
+    def pagina_em_lotes(session, pool, page: int):
+        lotes: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        pool.submit(ler_pagina, session, page, lotes)
+        return lotes
+
+    def repassar_lotes(lotes: "queue.Queue[Any]") -> Tuple[bool, bool]:
+        """Move os micro-lotes da página para a fila do writer. (página tinha linhas, seguir)."""
+        vazia = True
+        while True:
+            try:
+                item = lotes.get(timeout=0.5)
+            except queue.Empty:
+                if parar.is_set():
+                    return True, False
+                continue
+            if item is _FIM:
+                return not vazia, True
+            if isinstance(item, BaseException):
+                raise item
+            vazia = False
+            if not entregar(fila, item):
+                return True, False
+
+    def produtor():
+        try:
+            with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+                em_voo = deque()
+                proxima = page_start
+                try:
+                    while not parar.is_set():
+                        while len(em_voo) < workers:
+                            if FETCH_FORMAT in ("ndjson", "arrow"):
+                                em_voo.append(pagina_em_lotes(session, pool, proxima))
+                            else:
+                                em_voo.append(pool.submit(fetch_page, session, proxima, filtros))
+                            proxima += page_step
+                        cabeca = em_voo.popleft()
+                        if isinstance(cabeca, queue.Queue):
+                            teve_linhas, seguir = repassar_lotes(cabeca)
+                            if not (teve_linhas and seguir):
+                                break
+                            continue
+                        data = cabeca.result()
+                        if not data:
+                            break
+                        if not entregar(fila, data):
+                            break
+                finally:
+                    descartar.set()
+                    for f in em_voo:
+                        if not isinstance(f, queue.Queue):
+                            f.cancel()
+        except BaseException as e:
+            entregar(fila, e)
+            return
+        entregar(fila, _FIM)
+
+    t = threading.Thread(target=produtor, name="fetch_dados", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = fila.get()
+            if item is _FIM:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        parar.set()
+        t.join()
 
 # --------------------------
 # SQL dinâmico de INSERT
@@ -132,33 +538,222 @@ def build_insert_sql(cols: List[str]) -> str:
     return f"INSERT INTO {core_fqn} ({insert_cols}) VALUES ({placeholders});"
 
 # --------------------------
-# MAIN
+# COPY em lote (modo bulk)
 # --------------------------
 
-def main():
-    print("→ Conectando ao Postgres …")
-    with connect(PG_DSN, row_factory=dict_row, autocommit=False) as conn:
-        with conn.cursor() as cur:
-            cur.execute("SET TIME ZONE 'UTC'")
+def build_copy_sql(cols: List[str], target: str = core_fqn) -> str:
+    copy_cols = ", ".join(ident(c) for c in cols)
+    return f"COPY {target} ({copy_cols}) FROM STDIN"
+
+def copy_rows(conn, copy_sql: str, rows: List[Tuple]) -> None:
+    with conn.cursor() as cur:
+        with cur.copy(copy_sql) as cp:
+            for r in rows:
+                cp.write_row(r)
+
+def gravar_isolando_erros(conn, gravar: Callable[[List[Tuple]], None], rows: List[Tuple], first_line: int) -> Tuple[int, List[Tuple[int, Exception]]]:
+    """
+    Grava `rows` com `gravar` (ex.: um único COPY) + COMMIT. Se o lote falhar,
+    divide ao meio e tenta de novo cada metade, até isolar as linhas ruins.
+    Retorna (inseridos, [(numero_da_linha, erro), ...]).
+    """
+    if not rows:
+        return 0, []
+    try:
+        gravar(rows)
+        conn.commit()
+        return len(rows), []
+    except Exception as e:
+        conn.rollback()
+        if len(rows) == 1:
+            return 0, [(first_line, e)]
 
-        table_cols, identity_cols, table_types = get_table_columns(conn)
+    meio = len(rows) // 2
+    ok_a, err_a = gravar_isolando_erros(conn, gravar, rows[:meio], first_line)
+    ok_b, err_b = gravar_isolando_erros(conn, gravar, rows[meio:], first_line + meio)
+    return ok_a + ok_b, err_a + err_b
 
-        excluded = set(identity_cols) | {"raw_loaded_at"}
-        insertable_cols = [c for c in table_cols if c not in excluded]
+# --------------------------
+# Carga incremental (watermark + upsert)
+# --------------------------
 
-        insert_sql = build_insert_sql(insertable_cols)
+KEY_COL     = "nk_ota_localizer_id"
+DATE_COL    = "date_purchase"
+STATE_TABLE = f"{ident(SCHEMA)}.{ident('ingest_state')}"
+STAGE_TABLE = ident(f"_stage_{TABLE_NAME}")
 
-        print(f"→ Tabela alvo: {core_fqn}")
-        print(f"→ Colunas inseridas ({len(insertable_cols)}): {insertable_cols}")
-        print("→ Duplicatas são permitidas (sem ON CONFLICT).")
+def ensure_state_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+          table_name        TEXT PRIMARY KEY,
+          watermark_date    TEXT,
+          last_localizer_id TEXT,
+          updated_at        TIMESTAMPTZ DEFAULT now()
+        );
+        """)
+    conn.commit()
+
+def read_watermark(conn, table_cols: List[str]) -> Optional[str]:
+    """Watermark salvo no state; na primeira execução, usa o maior date_purchase já carregado."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT watermark_date FROM {STATE_TABLE} WHERE table_name = %s", (TABLE_NAME,))
+        row = cur.fetchone()
+        if row and row["watermark_date"]:
+            return row["watermark_date"]
+        if DATE_COL not in table_cols:
+            return None
+        col = ident(DATE_COL)
+        cur.execute(f"SELECT max({col}::text) AS wm FROM {core_fqn} WHERE {col}::text ~ '^[0-9]{{4}}-'")
+        row = cur.fetchone()
+    return row["wm"] if row else None
+
+def save_watermark(conn, watermark_date: str, last_localizer_id: Optional[str]) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+        INSERT INTO {STATE_TABLE} (table_name, watermark_date, last_localizer_id, updated_at)
+        VALUES (%s, %s, %s, now())
+        ON CONFLICT (table_name) DO UPDATE
+          SET watermark_date    = EXCLUDED.watermark_date,
+              last_localizer_id = EXCLUDED.last_localizer_id,
+              updated_at        = now();
+        """, (TABLE_NAME, watermark_date, last_localizer_id))
+    conn.commit()
+
+def create_stage_table(conn, cols: List[str]) -> None:
+    """Tabela temporária com as colunas inseríveis; esvaziada a cada COMMIT."""
+    sel = ", ".join(ident(c) for c in cols)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} ON COMMIT DELETE ROWS "
+            f"AS SELECT {sel} FROM {core_fqn} WITH NO DATA"
+        )
+    conn.commit()
+
+def build_upsert_sql(cols: List[str]) -> List[str]:
+    """
+    Upsert por nk_ota_localizer_id a partir do stage. Usa DELETE + INSERT em vez de
+    ON CONFLICT porque a tabela alvo não tem UNIQUE na chave (e pode ter duplicatas antigas).
+      - várias versões da mesma chave na página: fica a de date_purchase mais recente
+        e, no empate, a que chegou por último (ctid do stage, esvaziado a cada página)
+      - linhas sem chave: o `since` é inclusivo e repete o dia do watermark, então só
+        entram se não houver na tabela uma linha sem chave idêntica em todas as colunas
+        (cópias idênticas sem chave na mesma página viram uma só: não há como distingui-las)
+    """
+    c = ", ".join(ident(x) for x in cols)
+    k = ident(KEY_COL)
+    ordem = f"{k}, {ident(DATE_COL)} DESC NULLS LAST, ctid DESC" if DATE_COL in cols else f"{k}, ctid DESC"
+    t_cols = ", ".join(f"t.{ident(x)}" for x in cols)
+    s_cols = ", ".join(f"s.{ident(x)}" for x in cols)
+    d = ident(DATE_COL)
+    # igualdade simples na data primeiro: deixa o BRIN/partições podarem a busca
+    mesma_data = f"(t.{d} = s.{d} OR (t.{d} IS NULL AND s.{d} IS NULL)) AND " if DATE_COL in cols else ""
+    return [
+        f"DELETE FROM {core_fqn} t USING {STAGE_TABLE} s WHERE t.{k} = s.{k}",
+        f"INSERT INTO {core_fqn} ({c}) SELECT DISTINCT ON ({k}) {c} FROM {STAGE_TABLE} WHERE {k} IS NOT NULL ORDER BY {ordem}",
+        f"INSERT INTO {core_fqn} ({c}) SELECT DISTINCT {s_cols} FROM {STAGE_TABLE} s WHERE s.{k} IS NULL "
+        f"AND NOT EXISTS (SELECT 1 FROM {core_fqn} t WHERE t.{k} IS NULL AND {mesma_data}"
+        f"({t_cols}) IS NOT DISTINCT FROM ({s_cols}))",
+    ]
+
+def upsert_rows(conn, stage_copy_sql: str, upsert_sql: List[str], rows: List[Tuple]) -> None:
+    copy_rows(conn, stage_copy_sql, rows)
+    with conn.cursor() as cur:
+        # sem UNIQUE na tabela, dois DELETE+INSERT concorrentes (--workers) duplicariam a mesma chave:
+        # o lock (até o COMMIT da página) serializa só o upsert; busca, conversão e COPY no stage seguem em paralelo
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (core_fqn,))
+        for sql in upsert_sql:
+            cur.execute(sql)
+
+def advance_watermark(batch: List[Dict[str, Any]], wm_date: Optional[str], wm_key: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    frame = getattr(batch, "frame", None)
+    if frame is not None:
+        if DATE_COL not in frame.columns:
+            return wm_date, wm_key
+        datas = frame[DATE_COL].astype(str)
+        datas = datas[datas.str.match(r"\d")]
+        if datas.empty:
+            return wm_date, wm_key
+        pos = datas.idxmax()
+        d = datas[pos]
+        if wm_date is None or d > wm_date:
+            wm_date, wm_key = d, frame[KEY_COL][pos] if KEY_COL in frame.columns else None
+        return wm_date, wm_key
+
+    for row in batch:
+        d = row.get(DATE_COL)
+        if d is None:
+            continue
+        d = str(d)
+        if d[:1].isdigit() and (wm_date is None or d > wm_date):
+            wm_date, wm_key = d, row.get(KEY_COL)
+    return wm_date, wm_key
 
-        total = inserted = failed = 0
+# --------------------------
+# MAIN
+# --------------------------
 
-        for batch in fetch_dados():
+def get_insertable_cols(conn) -> Tuple[List[str], List[str], Dict[str, str]]:
+    with conn.cursor() as cur:
+        cur.execute("SET TIME ZONE 'UTC'")
+
+    table_cols, identity_cols, table_types = get_table_columns(conn)
+
+    excluded = set(identity_cols) | {"raw_loaded_at"}
+    insertable_cols = [c for c in table_cols if c not in excluded]
+    return table_cols, insertable_cols, table_types
+
+def ingest_pages(conn, insertable_cols: List[str], table_types: Dict[str, str], filtros: Dict[str, Any],
+                 page_start: int = 1, page_step: int = 1, tag: str = "", mode: str = INGEST_MODE) -> Dict[str, Any]:
+    """Loop de carga de uma conexão: busca, converte e grava as páginas da sua fatia no modo `mode`."""
+    plan = build_converter_plan(insertable_cols, table_types)
+    insert_sql = build_insert_sql(insertable_cols)
+
+    if mode == "incremental":
+        create_stage_table(conn, insertable_cols)
+        upsert_sql = build_upsert_sql(insertable_cols)
+        stage_copy_sql = build_copy_sql(insertable_cols, STAGE_TABLE)
+        gravar = lambda rows: upsert_rows(conn, stage_copy_sql, upsert_sql, rows)
+    else:
+        copy_sql = build_copy_sql(insertable_cols)
+        gravar = lambda rows: copy_rows(conn, copy_sql, rows)
+
+    total = inserted = failed = 0
+    falhas_conversao: Dict[str, int] = {}
+    wm_date = wm_key = None
+    metrics = IngestMetrics()
+
+    paginas = iter(fetch_dados(filtros, page_start, page_step))
+    while True:
+        t0 = time.perf_counter()
+        batch = next(paginas, None)
+        t_wait = time.perf_counter() - t0
+        if batch is None:
+            break
+        # no modo serial a busca acontece dentro do next(): desconta http/decode da espera
+        t_wait = max(0.0, t_wait - batch.tempos["http"] - batch.tempos["decode"]) if FETCH_WORKERS <= 1 else t_wait
+
+        t0 = time.perf_counter()
+        rows, falhas = convert_page(plan, batch)
+        t_convert = time.perf_counter() - t0
+        for c, n in falhas.items():
+            falhas_conversao[c] = falhas_conversao.get(c, 0) + n
+
+        t0 = time.perf_counter()
+        if mode in ("copy", "incremental"):
+            ok, erros = gravar_isolando_erros(conn, gravar, rows, total + 1)  # ✅ COMMIT por página
+            total += len(rows)
+            inserted += ok
+            failed += len(erros)
+            for linha, e in erros:
+                print(f"{tag}[ERRO] linha {linha}: {type(e).__name__}: {e}", file=sys.stderr)
+            if mode == "incremental":
+                wm_date, wm_key = advance_watermark(batch, wm_date, wm_key)
+        else:
             with conn.cursor() as cur:
-                for row in batch:
+                for r in rows:
                     total += 1
-                    params = {c: cast_value(row.get(c), table_types.get(c, "")) for c in insertable_cols}
+                    params = dict(zip(insertable_cols, r))
                     try:
                         cur.execute(insert_sql, params)
                         conn.commit()  # ✅ COMMIT por linha
@@ -166,14 +761,131 @@ def main():
                     except Exception as e:
                         conn.rollback()
                         failed += 1
-                        print(f"[ERRO] linha {total}: {type(e).__name__}: {e}", file=sys.stderr)
+                        print(f"{tag}[ERRO] linha {total}: {type(e).__name__}: {e}", file=sys.stderr)
+
+        t_db = time.perf_counter() - t0
+        metrics.add_page(len(rows), wait=t_wait, convert=t_convert, db=t_db, **batch.tempos)
+
+        print(f"{tag}→ Inseridos acumulados: {inserted} | Falhas: {failed} | Processados: {total}")
+        if falhas:
+            print(f"{tag}[AVISO] valores não convertidos nesta página: {falhas}", file=sys.stderr)
 
-            print(f"→ Inseridos acumulados: {inserted} | Falhas: {failed} | Processados: {total}")
+    return {
+        "inserted": inserted, "failed": failed, "total": total,
+        "falhas_conversao": falhas_conversao, "wm_date": wm_date, "wm_key": wm_key,
+        "metrics": metrics.pages,
+    }
+
+def run_worker(worker_id: int, n_workers: int, filtros: Dict[str, Any], mode: str = INGEST_MODE) -> Dict[str, Any]:
+    """Processo worker: conexão própria, páginas worker_id+1, worker_id+1+N, ..."""
+    with connect(PG_DSN, row_factory=dict_row, autocommit=False) as conn:
+        _, insertable_cols, table_types = get_insertable_cols(conn)
+        return ingest_pages(conn, insertable_cols, table_types, filtros,
+                            page_start=worker_id + 1, page_step=n_workers, tag=f"[w{worker_id}] ", mode=mode)
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {"inserted": 0, "failed": 0, "total": 0, "falhas_conversao": {},
+                              "wm_date": None, "wm_key": None, "metrics": []}
+    for r in results:
+        merged["metrics"].extend(r["metrics"])
+        for k in ("inserted", "failed", "total"):
+            merged[k] += r[k]
+        for c, n in r["falhas_conversao"].items():
+            merged["falhas_conversao"][c] = merged["falhas_conversao"].get(c, 0) + n
+        if r["wm_date"] and (merged["wm_date"] is None or r["wm_date"] > merged["wm_date"]):
+            merged["wm_date"], merged["wm_key"] = r["wm_date"], r["wm_key"]
+    return merged
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Ingestão da API /dados para o Postgres.")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "1")),
+                    help="processos de carga em paralelo, cada um com sua conexão (padrão: 1)")
+    ap.add_argument("--report", default=os.getenv("INGEST_REPORT", "ingest_report.json"),
+                    help="relatório JSON com vazão e latências por etapa ('' desativa)")
+    ap.add_argument("--prom", default=os.getenv("INGEST_PROM_FILE", ""),
+                    help="textfile do Prometheus (opcional), ex.: /var/lib/node_exporter/ingest.prom")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = max(1, args.workers)
+    mode = INGEST_MODE
+    if workers > 1 and mode == "row":
+        # cada worker usa o caminho em lote; INSERT por linha não escala com conexões
+        mode = "copy"
+        print(f"→ INGEST_MODE=row com {workers} workers: usando copy nos workers.")
+
+    inicio = time.perf_counter()
+    print("→ Conectando ao Postgres …")
+    with connect(PG_DSN, row_factory=dict_row, autocommit=False) as conn:
+        table_cols, insertable_cols, table_types = get_insertable_cols(conn)
+
+        print(f"→ Tabela alvo: {core_fqn}")
+        print(f"→ Colunas inseridas ({len(insertable_cols)}): {insertable_cols}")
+        print(f"→ Modo de carga: {mode}")
+        print(f"→ Workers: {workers}")
+
+        filtros: Dict[str, Any] = {}
+        wm_inicial = None
+        if mode == "incremental":
+            if KEY_COL not in insertable_cols:
+                raise SystemExit(f"Modo incremental exige a coluna {KEY_COL} em {core_fqn}.")
+            ensure_state_table(conn)
+            wm_inicial = read_watermark(conn, table_cols)
+            if wm_inicial:
+                filtros["since"] = wm_inicial
+            print(f"→ Watermark atual ({DATE_COL}): {wm_inicial or '— carga completa —'}")
+            print(f"→ Upsert por {KEY_COL}." + (" Upserts dos workers serializados por advisory lock." if workers > 1 else ""))
+        else:
+            print("→ Duplicatas são permitidas (sem ON CONFLICT).")
+
+        if workers == 1:
+            res = ingest_pages(conn, insertable_cols, table_types, filtros, mode=mode)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                futures = [ex.submit(run_worker, i, workers, filtros, mode) for i in range(workers)]
+                res = merge_results([f.result() for f in futures])
+
+        wm_date = res["wm_date"] if res["wm_date"] and (not wm_inicial or res["wm_date"] > wm_inicial) else wm_inicial
+        wm_key = res["wm_key"] if wm_date == res["wm_date"] else None
+        if mode == "incremental" and wm_date:
+            if res["failed"]:
+                print(f"[AVISO] {res['failed']} falha(s): watermark mantido para reprocessar na próxima execução.", file=sys.stderr)
+            elif wm_date != wm_inicial:
+                save_watermark(conn, wm_date, wm_key)
+                print(f"→ Novo watermark ({DATE_COL}): {wm_date} | {KEY_COL}: {wm_key}")
 
         print("\n✅ Ingestão finalizada.")
-        print(f"   ✔ Inseridos: {inserted}")
-        print(f"   ✖ Falhas   : {failed}")
-        print(f"   Σ Processados: {total}")
+        print(f"   ✔ Inseridos: {res['inserted']}")
+        print(f"   ✖ Falhas   : {res['failed']}")
+        print(f"   Σ Processados: {res['total']}")
+        if res["falhas_conversao"]:
+            print("   ⚠ Falhas de conversão por coluna:")
+            for c, n in sorted(res["falhas_conversao"].items(), key=lambda kv: -kv[1]):
+                print(f"     - {c}: {n}")
+
+    write_reports(args, res, time.perf_counter() - inicio, workers, mode)
+
+def write_reports(args: argparse.Namespace, res: Dict[str, Any], wall_seconds: float, workers: int,
+                  mode: str = INGEST_MODE) -> None:
+    if not (args.report or args.prom):
+        return
+    counts = {k: res[k] for k in ("inserted", "failed", "total")}
+    report = IngestMetrics(res["metrics"]).report(
+        wall_seconds, counts,
+        table=f"{SCHEMA}.{TABLE_NAME}", mode=mode, workers=workers,
+        fetch_workers=FETCH_WORKERS, fetch_format=FETCH_FORMAT, page_size=PAGE_SIZE,
+        conversion_failures=res["falhas_conversao"],
+    )
+    print(f"\n→ Vazão: {report['rows_per_s']} linhas/s em {report['wall_s']}s")
+    for st, v in report["stages"].items():
+        print(f"   {st:<8} total {v['total_s']:>9.3f}s | p50 {v['p50_s']:.4f}s | p95 {v['p95_s']:.4f}s | p99 {v['p99_s']:.4f}s")
+    if args.report:
+        write_json_report(args.report, report)
+        print(f"→ Relatório JSON: {args.report}")
+    if args.prom:
+        write_prometheus_textfile(args.prom, report, {"table": f"{SCHEMA}.{TABLE_NAME}", "mode": mode})
+        print(f"→ Textfile Prometheus: {args.prom}")
 
 if __name__ == "__main__":
     try:
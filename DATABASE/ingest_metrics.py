@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentação da ingestão: tempo por etapa e por página.
+
+Etapas medidas em cada página:
+  - wait    : writer parado esperando a próxima página do fetcher
+  - http    : requisição + download do corpo
+  - decode  : JSON/NDJSON -> dicts
+  - convert : plano de conversão (convert_page)
+  - db      : COPY / INSERT + COMMIT
+
+Gera um relatório JSON (rows/s, p50/p95/p99 por etapa) e, opcionalmente,
+um textfile no formato do Prometheus (node_exporter textfile collector).
+"""
+
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+STAGES = ("wait", "http", "decode", "convert", "db")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil por interpolação linear (mesmo critério do numpy 'linear')."""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+class IngestMetrics:
+    """Acumula uma entrada por página: linhas + segundos gastos em cada etapa."""
+
+    def __init__(self, pages: Optional[List[Dict[str, float]]] = None):
+        self.pages: List[Dict[str, float]] = list(pages or [])
+
+    def add_page(self, rows: int, **tempos: float) -> None:
+        page = {"rows": rows}
+        for st in STAGES:
+            page[st] = float(tempos.get(st, 0.0))
+        self.pages.append(page)
+
+    def merge(self, other: "IngestMetrics") -> "IngestMetrics":
+        self.pages.extend(other.pages)
+        return self
+
+    def report(self, wall_seconds: float, counts: Dict[str, int], **extra: Any) -> Dict[str, Any]:
+        rows = sum(p["rows"] for p in self.pages)
+        stages = {}
+        for st in STAGES:
+            vals = [p[st] for p in self.pages]
+            total = sum(vals)
+            stages[st] = {
+                "total_s": round(total, 6),
+                "rows_per_s": round(rows / total, 2) if total > 0 else None,
+                **{f"p{round(q * 100)}_s": round(percentile(vals, q), 6) for q in QUANTILES},
+            }
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "wall_s": round(wall_seconds, 3),
+            "pages": len(self.pages),
+            "rows": rows,
+            "rows_per_s": round(rows / wall_seconds, 2) if wall_seconds > 0 else None,
+            **counts,
+            "stages": stages,
+            **extra,
+        }
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_json_report(path: str, report: Dict[str, Any]) -> None:
+    _write_atomic(path, json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+
+
+def write_prometheus_textfile(path: str, report: Dict[str, Any], labels: Dict[str, str]) -> None:
+    """Escreve as métricas no formato texto do Prometheus (troca atômica do arquivo)."""
+    def esc(v: Any) -> str:
+        return str(v).replace("\\", "\\\\").replace('"', '\\"')
+
+    def fmt_labels(**more: str) -> str:
+        body = ",".join(f'{k}="{esc(v)}"' for k, v in {**labels, **more}.items())
+        return "{" + body + "}" if body else ""
+
+    lines = [
+        "# HELP ingest_rows Linhas processadas na última execução, por status.",
+        "# TYPE ingest_rows gauge",
+    ]
+    for status in ("inserted", "failed", "total"):
+        lines.append(f"ingest_rows{fmt_labels(status=status)} {report.get(status, 0)}")
+    lines += [
+        "# HELP ingest_duration_seconds Duração total da última execução.",
+        "# TYPE ingest_duration_seconds gauge",
+        f"ingest_duration_seconds{fmt_labels()} {report['wall_s']}",
+        "# HELP ingest_rows_per_second Vazão da última execução (linhas/s).",
+        "# TYPE ingest_rows_per_second gauge",
+        f"ingest_rows_per_second{fmt_labels()} {report['rows_per_s'] or 0}",
+        "# HELP ingest_stage_seconds Latência por página de cada etapa.",
+        "# TYPE ingest_stage_seconds summary",
+    ]
+    for st, vals in report["stages"].items():
+        for q in QUANTILES:
+            lines.append(f"ingest_stage_seconds{fmt_labels(stage=st, quantile=str(q))} {vals[f'p{round(q * 100)}_s']}")
+        lines.append(f"ingest_stage_seconds_sum{fmt_labels(stage=st)} {vals['total_s']}")
+        lines.append(f"ingest_stage_seconds_count{fmt_labels(stage=st)} {report['pages']}")
+    lines += [
+        "# HELP ingest_last_run_timestamp_seconds Fim da última execução (epoch).",
+        "# TYPE ingest_last_run_timestamp_seconds gauge",
+        f"ingest_last_run_timestamp_seconds{fmt_labels()} {int(time.time())}",
+    ]
+    _write_atomic(path, "\n".join(lines) + "\n")
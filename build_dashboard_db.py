@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Materializa a tabela df_consolidado usada pelo dashboard (streamlit_app.py).
+
+Roda uma vez por rodada dos modelos, depois que as tabelas de origem foram
+(re)gravadas em data/dashboard_data.db:
+  - clientes_com_clusters  (client_id, cluster, tipo_cliente)
+  - predicao_prox_compra   (client_id, prox_compra_7_dias, prob_prox_compra_7_dias)
+  - predicoes_next_route   (client_id, top1 … top5)
+  - df_curado              (purchase_datetime, client_id, total_value, …)
+
+Uma linha por cliente, com o mesmo resultado do merge + drop_duplicates que o
+app fazia a cada cache miss: cada tabela é reduzida à primeira linha de cada
+client_id *antes* do join, então nada se multiplica. A tabela nova é montada
+ao lado e trocada numa transação, já com índices para os filtros do app, e a
+rodada fica registrada em dashboard_build.
+
+Uso:
+  python build_dashboard_db.py [--db data/dashboard_data.db]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+import pandas as pd
+
+DB_PATH = os.getenv("DASHBOARD_DB", "data/dashboard_data.db")
+
+TABLE_CLUSTERS        = "clientes_com_clusters"
+TABLE_PREDICAO_COMPRA = "predicao_prox_compra"
+TABLE_PREDICAO_ROTA   = "predicoes_next_route"
+TABLE_DADOS_COMPLETOS = "df_curado"
+TABLE_CONSOLIDADO     = "df_consolidado"
+TABLE_BUILD           = "dashboard_build"
+
+# colunas filtradas/ordenadas pelo dashboard
+INDEXES = {
+    "client_id": True,                 # único: uma linha por cliente
+    "tipo_cliente": False,
+    "purchase_datetime": False,
+    "prob_prox_compra_7_dias": False,
+    "prox_compra_7_dias": False,
+}
+
+
+def read_first_per_client(conn: sqlite3.Connection, table: str, cols="*") -> pd.DataFrame:
+    """Primeira linha (ordem de gravação) de cada client_id."""
+    sel = cols if cols == "*" else ", ".join(cols)
+    return pd.read_sql_query(
+        f"SELECT {sel} FROM {table} "
+        f"WHERE rowid IN (SELECT min(rowid) FROM {table} GROUP BY client_id) ORDER BY rowid",
+        conn,
+    )
+
+
+def build_consolidado(conn: sqlite3.Connection) -> pd.DataFrame:
+    df_clusters = read_first_per_client(conn, TABLE_CLUSTERS)
+    df_pred_compra = read_first_per_client(conn, TABLE_PREDICAO_COMPRA)
+    df_pred_rota = read_first_per_client(conn, TABLE_PREDICAO_ROTA)
+    df_completo = read_first_per_client(conn, TABLE_DADOS_COMPLETOS,
+                                        ["client_id", "purchase_datetime", "total_value"])
+
+    df = df_clusters.merge(df_pred_compra, on="client_id", how="left", validate="one_to_one")
+    df = df.merge(df_pred_rota, on="client_id", how="left", validate="one_to_one")
+    df = df.merge(df_completo, on="client_id", how="left", validate="one_to_one")
+    df["purchase_datetime"] = pd.to_datetime(df["purchase_datetime"])
+
+    df["acerto_previsao_compra"] = ((df["prox_compra_7_dias"] == 1.0) & (df["total_value"].notna())).astype(int)
+    return df
+
+
+def publish(conn: sqlite3.Connection, df: pd.DataFrame, table: str = TABLE_CONSOLIDADO,
+            indexes: dict = INDEXES) -> None:
+    """
+    Grava em tabela temporária e troca pela atual numa única transação, com os índices
+    (chave: coluna ou colunas separadas por vírgula; valor: se é UNIQUE).
+    """
+    publish_tables(conn, [(table, df, indexes)])
+
+
+def publish_tables(conn: sqlite3.Connection, tabelas) -> None:
+    """
+    publish de várias tabelas [(tabela, df, índices), ...] trocadas na mesma transação:
+    quem lê uma e depois a outra nunca mistura rodadas.
+    """
+    nivel = conn.isolation_level
+    try:
+        # tabelas temporárias: os INSERTs numa transação implícita só (em autocommit seria um commit por linha)
+        conn.isolation_level = "DEFERRED"
+        for table, df, _ in tabelas:
+            conn.execute(f"DROP TABLE IF EXISTS {table}__build")
+            df.to_sql(f"{table}__build", conn, index=False)
+        conn.commit()
+
+        # a troca: as transações implícitas do módulo sqlite3 não cobrem DDL, então BEGIN/COMMIT explícitos.
+        # Leitores veem as tabelas antigas ou as novas, nunca meio termo
+        conn.isolation_level = None
+        built_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_BUILD} "
+                "(table_name TEXT PRIMARY KEY, built_at TEXT, rows INTEGER)"
+            )
+            for table, df, indexes in tabelas:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"ALTER TABLE {table}__build RENAME TO {table}")
+                for cols, unique in indexes.items():
+                    nomes = [c.strip() for c in cols.split(",")]
+                    if all(c in df.columns for c in nomes):
+                        conn.execute(
+                            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+                            f"ix_{table}_{'_'.join(nomes)} ON {table} ({', '.join(nomes)})"
+                        )
+                conn.execute(f"INSERT OR REPLACE INTO {TABLE_BUILD} VALUES (?, ?, ?)", (table, built_at, len(df)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("ANALYZE")
+    finally:
+        conn.isolation_level = nivel
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Materializa df_consolidado para o dashboard.")
+    ap.add_argument("--db", default=DB_PATH, help=f"banco SQLite do dashboard (padrão: {DB_PATH})")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    inicio = time.perf_counter()
+    print(f"→ Abrindo {args.db} …")
+    conn = sqlite3.connect(args.db, isolation_level=None)  # transações explícitas no publish
+    try:
+        df = build_consolidado(conn)
+        print(f"→ {len(df)} clientes consolidados. Publicando {TABLE_CONSOLIDADO} …")
+        publish(conn, df)
+    finally:
+        conn.close()
+    print(f"✅ {TABLE_CONSOLIDADO} pronta em {time.perf_counter() - inicio:.2f}s "
+          f"(índices: {', '.join(INDEXES)}).")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        print(f"ERRO: {type(e).__name__} {e}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Previsão diária de GMV por rota para a página de previsões (views/previsoes.py).
+
+Lê o cubo de demanda do histórico (views/dados: data/df_t.csv → Parquet) e
+monta uma matriz série × dia com o GMV diário de cada rota origem→destino,
+mais as séries agregadas que os filtros da página podem pedir (cada origem
+com destino "Todos", cada destino com origem "Todos" e o total). Todas as
+séries são ajustadas e projetadas de uma vez, com operações sobre a matriz
+inteira, sem laço por rota:
+
+  - sazonalidade semanal: peso de cada dia da semana nas últimas FIT_WEEKS
+    semanas, encolhido para o perfil do total quando a série tem poucos dias
+    com venda
+  - nível e tendência: reta de mínimos quadrados sobre os totais semanais das
+    mesmas semanas, projetada para o horizonte (nunca abaixo de zero)
+
+O resultado vai para o banco do dashboard, as duas tabelas trocadas na mesma
+transação (build_dashboard_db.publish_tables):
+  - previsao_gmv         (origem, destino, data, gmv, tipo: real | previsto),
+                         com os últimos HISTORY_DAYS dias reais e o horizonte
+  - previsao_gmv_resumo  (origem, destino, alertas, pico_inicio, pico_gmv,
+                         pico_vs_media, tendencia): os cartões da página
+
+A página só faz uma busca indexada por (origem, destino).
+
+Uso:
+  python build_forecasts.py [--db data/dashboard_data.db] [--horizon 60]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+import build_dashboard_db as bdb
+from views import dados
+
+TABLE_PREVISAO = dados.TABLE_PREVISAO
+TABLE_RESUMO   = dados.TABLE_RESUMO
+TODOS          = "Todos"   # mesmo sentinela dos filtros da página
+SEM_LOCAL      = "nan"     # origem/destino nulos: o rótulo que a cópia tipada (views/dados) já dá a eles
+
+HORIZON_DAYS  = int(os.getenv("FORECAST_HORIZON_DAYS", "60"))
+HISTORY_DAYS  = int(os.getenv("FORECAST_HISTORY_DAYS", "90"))   # dias reais gravados para o gráfico
+FIT_WEEKS     = int(os.getenv("FORECAST_FIT_WEEKS", "8"))       # janela do ajuste
+SHRINK_DAYS   = float(os.getenv("FORECAST_SHRINK_DAYS", "14"))  # dias com venda p/ peso 1/2 no perfil próprio
+ALERT_MARGIN  = float(os.getenv("FORECAST_ALERT_MARGIN", "0.2"))    # alta demanda: +20% sobre a média recente
+
+INDEXES_PREVISAO = {"origem, destino, data": True}
+INDEXES_RESUMO   = {"origem, destino": True}
+
+
+# =========================
+# Matriz série × dia
+# =========================
+def daily_matrix(cube: pd.DataFrame, days: int) -> Tuple[pd.DataFrame, pd.DatetimeIndex, np.ndarray]:
+    """
+    (chaves origem/destino de cada linha, dias, matriz K × dias de GMV diário).
+    Linhas: rotas observadas na janela, depois cada origem, cada destino e o total.
+    Origem ou destino nulos entram como SEM_LOCAL.
+    """
+    fim = cube["date_purchase"].max().normalize()
+    dias = pd.date_range(end=fim, periods=days, freq="D")
+    janela = cube[cube["date_purchase"] >= dias[0]]
+
+    # nulo vira rótulo próprio antes dos códigos: o código -1 do pandas cairia em outra rota
+    orig_cat = janela["place_origin_departure"].astype(object).fillna(SEM_LOCAL).astype(str).astype("category")
+    dest_cat = janela["place_destination_departure"].astype(object).fillna(SEM_LOCAL).astype(str).astype("category")
+    o_cod = orig_cat.cat.codes.to_numpy().astype(np.int64)
+    d_cod = dest_cat.cat.codes.to_numpy().astype(np.int64)
+    dia = ((janela["date_purchase"].dt.normalize() - dias[0]).dt.days).to_numpy()
+    gmv = janela["gmv"].to_numpy(dtype="float64")
+
+    # rota = par de códigos; só as observadas na janela viram linha
+    n_dest = len(dest_cat.cat.categories)
+    rotas, rota_idx = np.unique(o_cod * n_dest + d_cod, return_inverse=True)
+    rota_par = np.column_stack([
+        np.asarray(orig_cat.cat.categories.astype(str))[rotas // n_dest],
+        np.asarray(dest_cat.cat.categories.astype(str))[rotas % n_dest],
+    ])
+    Y_rota = np.zeros((len(rotas), days))
+    np.add.at(Y_rota, (rota_idx, dia), gmv)
+
+    origens, o_idx = np.unique(rota_par[:, 0], return_inverse=True)
+    destinos, d_idx = np.unique(rota_par[:, 1], return_inverse=True)
+    Y_orig = np.zeros((len(origens), days))
+    Y_dest = np.zeros((len(destinos), days))
+    np.add.at(Y_orig, o_idx, Y_rota)
+    np.add.at(Y_dest, d_idx, Y_rota)
+    Y_total = Y_rota.sum(axis=0, keepdims=True)
+
+    chaves = pd.DataFrame({
+        "origem": np.concatenate([rota_par[:, 0], origens, np.full(len(destinos), TODOS), [TODOS]]),
+        "destino": np.concatenate([rota_par[:, 1], np.full(len(origens), TODOS), destinos, [TODOS]]),
+    })
+    return chaves, dias, np.vstack([Y_rota, Y_orig, Y_dest, Y_total])
+
+
+# =========================
+# Ajuste e previsão (vetorizados)
+# =========================
+def seasonal_forecast(Y: np.ndarray, horizon: int, fit_weeks: int = FIT_WEEKS,
+                      shrink_days: float = SHRINK_DAYS) -> np.ndarray:
+    """
+    Previsão K × horizon a partir das últimas fit_weeks semanas de cada linha de Y.
+    A última linha de Y é o total: o perfil semanal dele é o de referência.
+    """
+    K, T = Y.shape
+    recente = Y[:, T - fit_weeks * 7:].reshape(K, fit_weeks, 7)  # fases alinhadas ao fim da série
+    semanal = recente.sum(axis=2)                                 # K × semanas
+
+    # perfil semanal (média 1): próprio, encolhido para o do total
+    por_fase = recente.sum(axis=1)
+    total = por_fase.sum(axis=1, keepdims=True)
+    proprio = np.divide(por_fase * 7, total, out=np.ones_like(por_fase), where=total > 0)
+    referencia = proprio[-1]
+    dias_com_venda = (recente > 0).sum(axis=(1, 2))[:, None]
+    peso = dias_com_venda / (dias_com_venda + shrink_days)
+    perfil = peso * proprio + (1 - peso) * referencia
+
+    # reta nos totais semanais, centrada na janela
+    t = np.arange(fit_weeks) - (fit_weeks - 1) / 2
+    inclinacao = (semanal * t).sum(axis=1) / (t ** 2).sum()
+    nivel = semanal.mean(axis=1)
+
+    h = np.arange(horizon)
+    semanas_a_frente = (fit_weeks - 1) / 2 + (h + 1) / 7
+    semanal_prev = np.maximum(nivel[:, None] + inclinacao[:, None] * semanas_a_frente, 0.0)
+    return semanal_prev / 7 * perfil[:, h % 7]
+
+
+def forecast_summary(Y_fit: np.ndarray, F: np.ndarray, inicio: pd.Timestamp,
+                     margin: float = ALERT_MARGIN) -> pd.DataFrame:
+    """
+    Cartões da página, por linha:
+      - alertas: dias previstos acima da média diária dos últimos 28 dias reais
+        mais a margem (alta demanda)
+      - pico: semana (blocos de 7 dias a partir do início) de maior GMV previsto,
+        e quanto ela fica acima da média semanal prevista
+      - tendencia: média diária prevista x média dos últimos 28 dias reais
+    """
+    recente = Y_fit[:, -28:].mean(axis=1)
+    alertas = (F > (1 + margin) * recente[:, None]).sum(axis=1) * (recente > 0)
+
+    semanas = F.shape[1] // 7
+    por_semana = F[:, :semanas * 7].reshape(len(F), semanas, 7).sum(axis=2)
+    pico = por_semana.argmax(axis=1)
+    pico_gmv = por_semana.max(axis=1)
+    media_semanal = por_semana.mean(axis=1)
+    pico_vs_media = np.divide(pico_gmv, media_semanal, out=np.ones_like(pico_gmv), where=media_semanal > 0) - 1
+
+    tendencia = np.divide(F.mean(axis=1), recente, out=np.ones_like(recente), where=recente > 0) - 1
+
+    return pd.DataFrame({
+        "alertas": alertas.astype(int),
+        "pico_inicio": (inicio + pd.to_timedelta(pico * 7, unit="D")).strftime("%Y-%m-%d"),
+        "pico_gmv": pico_gmv,
+        "pico_vs_media": pico_vs_media,
+        "tendencia": tendencia,
+    })
+
+
+def build_forecasts(cube: pd.DataFrame, horizon: int = HORIZON_DAYS, history_days: int = HISTORY_DAYS,
+                    fit_weeks: int = FIT_WEEKS) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(tabela longa real + previsto, resumo por origem/destino)."""
+    janela = max(fit_weeks * 7, history_days, 28)
+    chaves, dias, Y = daily_matrix(cube, janela)
+    F = seasonal_forecast(Y, horizon, fit_weeks)
+    futuro = pd.date_range(dias[-1] + pd.Timedelta(days=1), periods=horizon, freq="D")
+
+    K = len(chaves)
+    real = Y[:, -history_days:]
+    datas = np.concatenate([dias[-history_days:].strftime("%Y-%m-%d"), futuro.strftime("%Y-%m-%d")])
+    longa = pd.DataFrame({
+        "origem": np.repeat(chaves["origem"].to_numpy(), len(datas)),
+        "destino": np.repeat(chaves["destino"].to_numpy(), len(datas)),
+        "data": np.tile(datas, K),
+        "gmv": np.hstack([real, F]).ravel(),
+        "tipo": np.tile(np.array(["real"] * history_days + ["previsto"] * horizon), K),
+    })
+    resumo = pd.concat([chaves, forecast_summary(Y[:, -fit_weeks * 7:], F, futuro[0])], axis=1)
+    return longa, resumo
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Previsão diária de GMV por rota para o dashboard.")
+    ap.add_argument("--db", default=bdb.DB_PATH, help=f"banco SQLite do dashboard (padrão: {bdb.DB_PATH})")
+    ap.add_argument("--horizon", type=int, default=HORIZON_DAYS, help="dias previstos")
+    ap.add_argument("--history", type=int, default=HISTORY_DAYS, help="dias reais gravados para o gráfico")
+    ap.add_argument("--fit-weeks", type=int, default=FIT_WEEKS, help="semanas usadas no ajuste")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    inicio = time.perf_counter()
+    print(f"→ Lendo o cubo de demanda de {dados.DF_T_CSV} …")
+    cube = pd.read_parquet(dados.ensure_cube())
+    longa, resumo = build_forecasts(cube, args.horizon, args.history, args.fit_weeks)
+    print(f"→ {len(resumo)} séries previstas ({args.horizon} dias). Publicando em {args.db} …")
+    conn = sqlite3.connect(args.db, isolation_level=None)  # transações explícitas no bdb.publish
+    try:
+        # série e cartões trocados juntos: a página nunca lê uma rodada de cada
+        bdb.publish_tables(conn, [(TABLE_PREVISAO, longa, INDEXES_PREVISAO), (TABLE_RESUMO, resumo, INDEXES_RESUMO)])
+    finally:
+        conn.close()
+    print(f"✅ {TABLE_PREVISAO} e {TABLE_RESUMO} prontas em {time.perf_counter() - inicio:.2f}s.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        print(f"ERRO: {type(e).__name__} {e}", file=sys.stderr)
+        sys.exit(2)
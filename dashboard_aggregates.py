@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+Agregados de cada página do dashboard como funções puras.
+
+Recebem o recorte já filtrado (ou a fonte + os filtros) e devolvem só as
+tabelas pequenas que os gráficos usam. Como o resultado depende apenas da
+base (build_stamp) e dos filtros normalizados, o app guarda tudo num LRU
+compartilhado entre sessões (st.cache_data): trocar de página ou voltar a
+um filtro já visto não refaz nenhum groupby.
+"""
+
+from typing import Any, Dict, Sequence
+
+import pandas as pd
+
+import dashboard_queries as dq
+
+ROUTES_PAGE = "Previsão de Rotas"
+
+
+def normalize_filtros(f: dq.Filtros, page: str = ROUTES_PAGE) -> dq.Filtros:
+    """
+    Chave canônica: os tops só valem na página de rotas e não dependem da
+    ordem de seleção; sem tops escolhidos equivale a 'Todos'.
+    """
+    tops = tuple(sorted(dq.selected_tops(f))) if page == ROUTES_PAGE else ()
+    return f._replace(
+        cluster=str(f.cluster),
+        date_range=tuple(f.date_range),
+        prob_threshold=int(f.prob_threshold),
+        tops=tops or ("Todos",),
+    )
+
+
+# =========================
+# Agregados por gráfico
+# =========================
+def cluster_counts(df: pd.DataFrame) -> pd.Series:
+    counts = df["tipo_cliente"].value_counts()
+    return counts[counts > 0]  # categorias sem clientes no filtro
+
+
+def prob_histogram(df: pd.DataFrame) -> pd.DataFrame:
+    prob_data = df.groupby(pd.cut(df["prob_prox_compra_7_dias"], bins=10), observed=False).size().reset_index(name="count")
+    prob_data["percentage"] = (prob_data["count"] / prob_data["count"].sum()) * 100
+    prob_data["prob_range"] = prob_data["prob_prox_compra_7_dias"].apply(lambda i: f"{int(i.left * 100)}-{int(i.right * 100)}%")
+    return prob_data.drop(columns=["prob_prox_compra_7_dias"])
+
+
+def buy_counts(df: pd.DataFrame) -> pd.DataFrame:
+    counts = df["prox_compra_7_dias"].value_counts().reset_index()
+    counts.columns = ["Vão Comprar", "count"]
+    counts["Vão Comprar"] = counts["Vão Comprar"].map({0.0: "Não Vão Comprar", 1.0: "Vão Comprar"})
+    return counts
+
+
+def top_routes(df: pd.DataFrame, selected_tops: Sequence[str]) -> pd.DataFrame:
+    """df já vem só com previstos e com o filtro de tops (fetch_page da página de rotas)."""
+    cols = list(selected_tops) if "Todos" not in selected_tops else dq.TOP_COLS
+    all_routes = pd.concat([df[col] for col in cols]).dropna()
+    counts = all_routes.value_counts()
+    counts = counts[counts > 0].head(5).sort_values(ascending=False)
+    df_top_routes = counts.reset_index()
+    df_top_routes.columns = ["Rota", "Contagem"]
+    df_top_routes["Rota"] = df_top_routes["Rota"].astype(str)
+    return df_top_routes
+
+
+def revenue_comparison(df: pd.DataFrame) -> pd.DataFrame:
+    comp = df.groupby("prox_compra_7_dias")["total_value"].sum().reset_index()
+    comp.columns = ["Previsão de Compra", "Receita"]
+    comp["Previsão de Compra"] = comp["Previsão de Compra"].map({
+        0.0: "Receita Clientes NÃO Previstos 7 dias",
+        1.0: "Receita Clientes Previstos 7 dias",
+    })
+    return comp
+
+
+def daily_revenue(df: pd.DataFrame) -> pd.DataFrame:
+    daily = df.groupby(df["purchase_datetime"].dt.date)["total_value"].sum().reset_index()
+    daily.columns = ["Data", "Receita"]
+    return daily
+
+
+# =========================
+# Por página
+# =========================
+def page_aggregates(fonte: Any, f: dq.Filtros, page: str) -> Dict[str, Any]:
+    """
+    Tudo o que a página precisa para desenhar, a partir da fonte (FilterEngine
+    ou dashboard_queries). `empty` indica que o recorte não tem linhas.
+    """
+    df = fonte.fetch_page(f, page)
+    out: Dict[str, Any] = {"empty": df.empty, "rows": len(df)}
+    if df.empty:
+        return out
+    if page == "Análise de Clusters":
+        out["cluster_counts"] = cluster_counts(df)
+    elif page == "Previsão de Compra":
+        out["prob_histogram"] = prob_histogram(df)
+        out["buy_counts"] = buy_counts(df)
+    elif page == ROUTES_PAGE:
+        out["top_routes"] = top_routes(df, f.tops)
+    elif page == "Comparativo de Receita":
+        out["revenue_comparison"] = revenue_comparison(df)
+    elif page == "Receita por Data":
+        out["daily_revenue"] = daily_revenue(df)
+    return out
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Exportação das listas de clientes previstos (campanhas) sob demanda.
+
+Antes o app serializava as duas listas em CSV a cada rerun, clicassem ou não
+no download. Aqui o arquivo só é gerado quando alguém pede, escrito em pedaços
+(predicted_clients_chunks da fonte) direto para disco, em CSV gzip ou Parquet,
+e fica guardado em EXPORT_DIR com nome derivado de (build, filtros, formato):
+o próximo pedido com a mesma chave, de qualquer sessão, só relê o arquivo.
+Um build novo do df_consolidado muda a chave e apaga os arquivos antigos.
+
+Sem dependência do Streamlit.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+import dashboard_queries as dq
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow só há CSV gzip
+    pa = pq = None
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join("data", "exports"))
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "100000"))  # linhas por pedaço / row group
+GZIP_LEVEL = int(os.environ.get("EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_COLUMNS = ["client_id"] + dq.TOP_COLS
+
+# formato -> (rótulo, extensão, mimetype)
+FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "csv.gz": ("CSV (gzip)", "csv.gz", "application/gzip"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats() -> Dict[str, Tuple[str, str, str]]:
+    return {k: v for k, v in FORMATS.items() if k != "parquet" or pq is not None}
+
+
+# =========================
+# Chave e caminho
+# =========================
+def _digest(obj: Any, n: int) -> str:
+    return hashlib.sha1(json.dumps(obj, default=str).encode("utf-8")).hexdigest()[:n]
+
+
+def export_key(f: Optional[dq.Filtros]) -> Any:
+    """Só o que muda a lista: None (todos os previstos) ou cluster/período/limiar."""
+    if f is None:
+        return None
+    return [f.cluster, [d.isoformat() for d in f.date_range], int(f.prob_threshold)]
+
+
+def export_path(build_stamp: str, f: Optional[dq.Filtros], fmt: str) -> str:
+    ext = FORMATS[fmt][1]
+    return os.path.join(EXPORT_DIR, f"{_digest(build_stamp, 8)}_{_digest([export_key(f), fmt], 16)}.{ext}")
+
+
+def _prune_old_builds(build_stamp: str) -> None:
+    """Apaga exportações de builds anteriores (o prefixo do nome é o build)."""
+    prefix = _digest(build_stamp, 8) + "_"
+    for name in os.listdir(EXPORT_DIR):
+        if not name.startswith(prefix) and not name.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(EXPORT_DIR, name))
+            except OSError:
+                pass
+
+
+# =========================
+# Escrita em pedaços
+# =========================
+def _as_text(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Tops categóricos viram texto (o dicionário muda de um pedaço para outro no caminho SQL)."""
+    return chunk[EXPORT_COLUMNS].astype(object).where(chunk[EXPORT_COLUMNS].notna(), None)
+
+
+def write_csv_gz(chunks: Iterable[pd.DataFrame], path: str) -> int:
+    rows = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=GZIP_LEVEL) as fh:
+        pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(fh, index=False)  # cabeçalho, mesmo sem linhas
+        for chunk in chunks:
+            chunk[EXPORT_COLUMNS].to_csv(fh, index=False, header=False)
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks: Iterable[pd.DataFrame], path: str) -> int:
+    schema = pa.schema([(c, pa.string()) for c in EXPORT_COLUMNS])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(_as_text(chunk), schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+_WRITERS = {"csv.gz": write_csv_gz, "parquet": write_parquet}
+
+
+def ensure_export(fonte: Any, build_stamp: str, f: Optional[dq.Filtros], fmt: str) -> str:
+    """
+    Caminho do arquivo de exportação, gerando-o se ainda não existe.
+    fonte: FilterEngine ou dashboard_queries (predicted_clients_chunks).
+    A escrita vai para um .tmp e só então é renomeada: quem chegar depois
+    nunca vê um arquivo pela metade.
+    """
+    path = export_path(build_stamp, f, fmt)
+    if os.path.exists(path):
+        return path
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _prune_old_builds(build_stamp)
+    # nome único por chamada: sessões do Streamlit são threads do mesmo processo
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        _WRITERS[fmt](fonte.predicted_clients_chunks(f, EXPORT_CHUNK_ROWS), tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
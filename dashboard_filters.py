@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Motor de filtros em memória do dashboard, montado uma vez por carga.
+
+Sobre o df_consolidado compacto (dashboard_frame), pré-calcula:
+  - as posições ordenadas por purchase_datetime (int64 ns), para o período
+    virar dois searchsorted
+  - um conjunto de posições por tipo_cliente
+  - as posições ordenadas por probabilidade, para o limiar do slider
+  - os previstos (prox_compra_7_dias == 1) e, por top de rota, quem o tem
+
+Cada rerun só combina esses conjuntos e materializa as linhas selecionadas,
+nas colunas da página ativa: nada de copiar o frame inteiro nem de converter
+datas. Mesma interface de dashboard_queries (fetch_page, summary_metrics,
+predicted_clients), que segue como caminho SQL.
+"""
+
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import dashboard_queries as dq
+from dashboard_frame import CompactConsolidado
+
+
+def _sorted_positions(values: np.ndarray, valid: np.ndarray):
+    """(valores válidos em ordem crescente, posições correspondentes)."""
+    pos = np.flatnonzero(valid)
+    order = np.argsort(values[pos], kind="stable")
+    return values[pos][order], pos[order]
+
+
+class FilterEngine:
+    def __init__(self, compact: CompactConsolidado):
+        self.compact = compact
+        self.frame = compact.frame
+        self.n = len(self.frame)
+        frame = self.frame
+
+        dates = frame["purchase_datetime"].to_numpy(dtype="datetime64[ns]")
+        self.date_values, self.date_pos = _sorted_positions(dates.view("int64"), ~np.isnat(dates))
+
+        probs = frame["prob_prox_compra_7_dias"].to_numpy(dtype="float64")
+        self.prob_values, self.prob_pos = _sorted_positions(probs, ~np.isnan(probs))
+
+        self.by_cluster: Dict[str, np.ndarray] = {
+            str(k): np.asarray(v, dtype=np.intp)
+            for k, v in frame.groupby("tipo_cliente", observed=True, sort=False).indices.items()
+        }
+        self.predicted = np.flatnonzero(frame["prox_compra_7_dias"].to_numpy(dtype="float64") == 1)
+        self.top_notna = {c: frame[c].notna().to_numpy() for c in dq.TOP_COLS if c in frame.columns}
+
+        self._col_loc = {c: frame.columns.get_loc(c) for c in frame.columns}
+
+    # ---------- conjuntos de posições ----------
+    def _date_rows(self, start, end) -> np.ndarray:
+        lo = np.searchsorted(self.date_values, pd.Timestamp(start).value, side="left")
+        hi = np.searchsorted(self.date_values, pd.Timestamp(end + timedelta(days=1)).value, side="left")
+        return self.date_pos[lo:hi]
+
+    def _prob_rows(self, threshold: float) -> np.ndarray:
+        lo = np.searchsorted(self.prob_values, threshold, side="left")
+        return self.prob_pos[lo:]
+
+    def select(self, f: dq.Filtros, only_predicted: bool = False, with_tops: bool = False) -> np.ndarray:
+        """Posições (em ordem de linha) que passam em todos os filtros."""
+        sets: List[np.ndarray] = []
+        if f.cluster != "Todos":
+            sets.append(self.by_cluster.get(str(f.cluster), np.empty(0, dtype=np.intp)))
+        if len(f.date_range) == 2:
+            sets.append(self._date_rows(*f.date_range))
+        sets.append(self._prob_rows(f.prob_threshold / 100))
+        if only_predicted:
+            sets.append(self.predicted)
+
+        # parte do menor conjunto e filtra pelos outros com máscaras de n bytes
+        sets.sort(key=len)
+        rows = np.sort(sets[0])
+        for other in sets[1:]:
+            if not len(rows):
+                break
+            mask = np.zeros(self.n, dtype=bool)
+            mask[other] = True
+            rows = rows[mask[rows]]
+
+        tops = dq.selected_tops(f) if with_tops else []
+        if tops and len(rows):
+            algum = np.logical_or.reduce([self.top_notna[t] for t in tops])
+            rows = rows[algum[rows]]
+        return rows
+
+    # ---------- mesma interface de dashboard_queries ----------
+    def fetch_filtered(self, f: dq.Filtros, columns: Sequence[str], only_predicted: bool = False,
+                       with_tops: bool = False) -> pd.DataFrame:
+        rows = self.select(f, only_predicted, with_tops)
+        cols = list(dict.fromkeys(columns))
+        with_id = "client_id" in cols
+        if with_id:
+            cols = ["client_code" if c == "client_id" else c for c in cols]
+        out = self.frame.iloc[rows, [self._col_loc[c] for c in cols]].reset_index(drop=True)
+        return self.compact.with_client_id(out) if with_id else out
+
+    def fetch_page(self, f: dq.Filtros, page: str) -> pd.DataFrame:
+        if page == "Previsão de Rotas":
+            return self.fetch_filtered(f, dq.PAGE_COLUMNS[page], only_predicted=True, with_tops=True)
+        return self.fetch_filtered(f, dq.PAGE_COLUMNS.get(page, ["client_id"]))
+
+    def summary_metrics(self, f: dq.Filtros) -> Dict[str, float]:
+        rows = self.select(f)
+        prox = self.frame["prox_compra_7_dias"].to_numpy()[rows]
+        probs = self.frame["prob_prox_compra_7_dias"].to_numpy(dtype="float64")[rows]
+        valores = self.frame["total_value"].to_numpy(dtype="float64")[rows]
+        previstos = prox == 1
+        return {
+            "total_customers": int(len(rows)),  # client_id é único por linha (índice UNIQUE no build)
+            "next_buy_true": int(previstos.sum()),
+            "avg_prob": float(np.nanmean(probs)) if len(rows) else float("nan"),
+            "predicted_revenue": float(np.nansum(valores[previstos])),
+        }
+
+    def predicted_clients(self, f: Optional[dq.Filtros] = None) -> pd.DataFrame:
+        cols = ["client_id"] + dq.TOP_COLS
+        if f is None:
+            out = self.frame.iloc[self.predicted, [self._col_loc["client_code"]] +
+                                  [self._col_loc[c] for c in dq.TOP_COLS]].reset_index(drop=True)
+            return self.compact.with_client_id(out)
+        return self.fetch_filtered(f, cols, only_predicted=True)
+
+    def predicted_clients_chunks(self, f: Optional[dq.Filtros] = None,
+                                 chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        """predicted_clients em pedaços: os client_id só são decodificados chunk a chunk."""
+        rows = self.predicted if f is None else self.select(f, only_predicted=True)
+        locs = [self._col_loc["client_code"]] + [self._col_loc[c] for c in dq.TOP_COLS]
+        for start in range(0, len(rows), chunk_rows):
+            out = self.frame.iloc[rows[start:start + chunk_rows], locs].reset_index(drop=True)
+            yield self.compact.with_client_id(out)
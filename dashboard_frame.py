@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+Representação compacta de df_consolidado em memória.
+
+A tabela lida do SQLite vem com tudo em object/float64/int64: tipo_cliente e
+top1…top5 repetem as mesmas strings ("Cidade_N") em cada linha e o client_id
+(hex de 64 caracteres) custa ~120 bytes por cliente como str do Python.
+Aqui ela vira:
+  - tipo_cliente e top1…top5 como category (os tops com um único dicionário
+    de rotas, compartilhado entre as cinco colunas)
+  - cluster / prox_compra_7_dias em inteiros pequenos (a probabilidade segue
+    float64, como no SQLite: o filtro prob >= limiar tem de bater nos centésimos;
+    total_value também: é dinheiro e entra em somas)
+  - client_id como client_code (int32) + matriz de 32 bytes por cliente; só é
+    decodificado de volta para hex quando alguém precisa do texto (exportação)
+
+Sem dependência do Streamlit: o app guarda o resultado de
+dashboard_queries.load_compact() em st.cache_resource, uma cópia por
+processo, compartilhada entre as sessões.
+"""
+
+import re
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLS = ["tipo_cliente"]
+ROUTE_COLS = ["top1", "top2", "top3", "top4", "top5"]
+SMALL_INT_COLS = ["cluster", "prox_compra_7_dias", "acerto_previsao_compra"]
+
+_HEX64 = re.compile(r"[0-9a-f]{64}")
+
+
+def compact_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Categóricos e numéricos reduzidos, para qualquer recorte de df_consolidado."""
+    out = df.copy()
+    for col in CATEGORY_COLS:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+
+    tops = [c for c in ROUTE_COLS if c in out.columns]
+    if tops:
+        rotas = pd.unique(pd.concat([out[c] for c in tops]).dropna())
+        dtype = pd.CategoricalDtype(sorted(rotas))
+        for col in tops:
+            out[col] = out[col].astype(dtype)
+
+    for col in SMALL_INT_COLS:
+        if col in out.columns:
+            s = out[col]
+            if s.isna().any():
+                out[col] = s.astype("float32")
+            else:
+                out[col] = pd.to_numeric(s, downcast="integer")
+    return out
+
+
+def frame_nbytes(frame: pd.DataFrame) -> int:
+    """
+    memory_usage(deep=True), mas contando uma vez só o dicionário de categorias
+    compartilhado (o pandas o soma de novo em cada coluna top1…top5).
+    """
+    total = int(frame.index.memory_usage(deep=True))
+    vistos = set()
+    for col in frame.columns:
+        s = frame[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            total += s.cat.codes.nbytes
+            cats = s.cat.categories
+            if id(cats) not in vistos:
+                vistos.add(id(cats))
+                total += int(cats.memory_usage(deep=True))
+        else:
+            total += int(s.memory_usage(deep=True, index=False))
+    return total
+
+
+class ClientIds:
+    """
+    client_id por posição. Hex de 64 caracteres viram 32 bytes fixos (matriz
+    uint8); se algum id fugir do formato, guarda as strings como vieram.
+    """
+
+    def __init__(self, ids: pd.Series):
+        valores = ids.astype(str).tolist()
+        if valores and all(_HEX64.fullmatch(v) for v in valores):
+            self.raw = np.frombuffer(bytes.fromhex("".join(valores)), dtype=np.uint8).reshape(-1, 32)
+            self.strings = None
+        else:
+            self.raw = None
+            self.strings = np.array(valores, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.raw) if self.raw is not None else len(self.strings)
+
+    @property
+    def nbytes(self) -> int:
+        if self.raw is not None:
+            return self.raw.nbytes
+        return int(pd.Series(self.strings).memory_usage(deep=True, index=False))
+
+    def decode(self, codes: Optional[Iterable[int]] = None) -> pd.Series:
+        """client_id em texto para as posições pedidas (todas, por padrão)."""
+        codes = np.arange(len(self)) if codes is None else np.asarray(codes)
+        if self.strings is not None:
+            return pd.Series(self.strings[codes], name="client_id")
+        h = self.raw[codes].tobytes().hex()
+        return pd.Series([h[i:i + 64] for i in range(0, len(h), 64)], name="client_id", dtype=object)
+
+
+class CompactConsolidado:
+    """df_consolidado compacto: `frame` (client_code no lugar de client_id) + `client_ids`."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.rows = len(df)
+        self.client_ids = ClientIds(df["client_id"])
+        frame = compact_columns(df.drop(columns=["client_id"]))
+        frame.insert(0, "client_code", np.arange(len(df), dtype=np.int32))
+        self.frame = frame.reset_index(drop=True)
+
+    @property
+    def nbytes(self) -> int:
+        return frame_nbytes(self.frame) + self.client_ids.nbytes
+
+    def with_client_id(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Troca client_code pelo client_id em texto (para exibir/exportar um recorte)."""
+        out = frame.drop(columns=["client_code"])
+        out.insert(0, "client_id", self.client_ids.decode(frame["client_code"]).to_numpy())
+        return out
+
+
+def memory_report(raw: pd.DataFrame, compact: CompactConsolidado) -> Dict[str, float]:
+    """Bytes totais e por cliente: tabela como o pandas lê do SQLite x versão compacta."""
+    antes = int(raw.memory_usage(deep=True).sum())
+    depois = compact.nbytes
+    n = max(compact.rows, 1)
+    return {
+        "clientes": compact.rows,
+        "bytes_antes": antes,
+        "bytes_depois": depois,
+        "bytes_por_cliente_antes": antes / n,
+        "bytes_por_cliente_depois": depois / n,
+        "reducao": 1 - depois / antes if antes else 0.0,
+    }
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Camada de acesso a dados do dashboard (streamlit_app.py).
+
+Transforma o estado da sidebar (cluster, período, probabilidade mínima e
+tops de rota) em SQL parametrizado sobre a tabela df_consolidado de
+data/dashboard_data.db, que build_dashboard_db.py materializa com índices em
+tipo_cliente, purchase_datetime, prob_prox_compra_7_dias e prox_compra_7_dias.
+Cada página busca só as linhas selecionadas e só as colunas que usa, já em
+tipos compactos (dashboard_frame); as métricas do topo saem agregadas direto
+do banco.
+
+Sem dependência do Streamlit: o cache fica a cargo de quem chama.
+"""
+
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from dashboard_frame import CompactConsolidado, compact_columns, memory_report
+
+DB_URI = "file:data/dashboard_data.db?mode=ro"
+TABLE = "df_consolidado"
+BUILD_TABLE = "dashboard_build"
+
+TOP_COLS = ["top1", "top2", "top3", "top4", "top5"]
+
+# Colunas que cada página do dashboard realmente usa
+PAGE_COLUMNS: Dict[str, List[str]] = {
+    "Análise de Clusters": ["tipo_cliente"],
+    "Previsão de Compra": ["prob_prox_compra_7_dias", "prox_compra_7_dias"],
+    "Previsão de Rotas": ["prox_compra_7_dias"] + TOP_COLS,
+    "Comparativo de Receita": ["prox_compra_7_dias", "total_value"],
+    "Receita por Data": ["purchase_datetime", "total_value"],
+}
+
+
+class Filtros(NamedTuple):
+    """Estado normalizado da sidebar (imutável e hashable, serve de chave de cache)."""
+    cluster: str = "Todos"
+    date_range: Tuple[date, ...] = ()
+    prob_threshold: int = 0
+    tops: Tuple[str, ...] = ("Todos",)
+
+
+def connect() -> sqlite3.Connection:
+    """Conexão somente leitura; barata no SQLite, então uma por consulta."""
+    return sqlite3.connect(DB_URI, uri=True)
+
+
+def query(sql: str, params: Sequence = (), parse_dates: Optional[List[str]] = None) -> pd.DataFrame:
+    conn = connect()
+    try:
+        return pd.read_sql_query(sql, conn, params=list(params), parse_dates=parse_dates)
+    finally:
+        conn.close()
+
+
+def build_stamp() -> Optional[str]:
+    """
+    Identifica a última materialização de df_consolidado (built_at) ou None se
+    o banco/tabela ainda não existem. Serve para invalidar caches após um build.
+    """
+    try:
+        df = query(f"SELECT built_at FROM {BUILD_TABLE} WHERE table_name = ?", [TABLE])
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return None
+    return df["built_at"].iloc[0] if not df.empty else None
+
+
+# =========================
+# Opções da sidebar
+# =========================
+def cluster_options() -> List[str]:
+    df = query(f"SELECT DISTINCT tipo_cliente FROM {TABLE} WHERE tipo_cliente IS NOT NULL ORDER BY tipo_cliente")
+    return df["tipo_cliente"].tolist()
+
+
+def date_bounds() -> Tuple[date, date]:
+    df = query(f"SELECT min(purchase_datetime) AS ini, max(purchase_datetime) AS fim FROM {TABLE}",
+               parse_dates=["ini", "fim"])
+    return df["ini"].iloc[0].date(), df["fim"].iloc[0].date()
+
+
+# =========================
+# Filtros -> SQL
+# =========================
+def selected_tops(f: Filtros) -> List[str]:
+    """Tops escolhidos na sidebar (validados: viram nomes de coluna no SQL)."""
+    if "Todos" in f.tops or not f.tops:
+        return []
+    return [t for t in f.tops if t in TOP_COLS]
+
+
+def where_clause(f: Filtros, only_predicted: bool = False, with_tops: bool = False) -> Tuple[str, list]:
+    """
+    WHERE equivalente aos filtros em memória do app:
+      - cluster      : tipo_cliente = ?
+      - período      : data da compra em [início, fim] (faixa sobre o índice, sem date())
+      - probabilidade: prob_prox_compra_7_dias >= limiar
+      - only_predicted / with_tops: recortes da página de rotas
+    Linhas com data ou probabilidade nulas ficam de fora, como no pandas.
+    """
+    conds, params = [], []
+    if f.cluster != "Todos":
+        conds.append("tipo_cliente = ?")
+        params.append(f.cluster)
+    if len(f.date_range) == 2:
+        start, end = f.date_range
+        conds.append("purchase_datetime >= ? AND purchase_datetime < ?")
+        params += [start.isoformat(), (end + timedelta(days=1)).isoformat()]
+    conds.append("prob_prox_compra_7_dias >= ?")
+    params.append(f.prob_threshold / 100)
+    if only_predicted:
+        conds.append("prox_compra_7_dias = 1")
+    tops = selected_tops(f) if with_tops else []
+    if tops:
+        conds.append("(" + " OR ".join(f"{t} IS NOT NULL" for t in tops) + ")")
+    return " AND ".join(conds), params
+
+
+def fetch_filtered(f: Filtros, columns: Sequence[str], only_predicted: bool = False,
+                   with_tops: bool = False) -> pd.DataFrame:
+    """Só as linhas selecionadas e só as colunas pedidas."""
+    cols = ", ".join(dict.fromkeys(columns))
+    where, params = where_clause(f, only_predicted, with_tops)
+    parse = ["purchase_datetime"] if "purchase_datetime" in columns else None
+    return compact_columns(query(f"SELECT {cols} FROM {TABLE} WHERE {where} ORDER BY rowid", params, parse))
+
+
+def fetch_page(f: Filtros, page: str) -> pd.DataFrame:
+    """Recorte da página ativa (a de rotas já vem só com previstos e com o filtro de tops)."""
+    if page == "Previsão de Rotas":
+        return fetch_filtered(f, PAGE_COLUMNS[page], only_predicted=True, with_tops=True)
+    return fetch_filtered(f, PAGE_COLUMNS.get(page, ["client_id"]))
+
+
+# =========================
+# Agregados
+# =========================
+def summary_metrics(f: Filtros) -> Dict[str, float]:
+    """As quatro métricas do topo, calculadas no banco."""
+    where, params = where_clause(f)
+    df = query(
+        f"""
+        SELECT count(DISTINCT client_id)                                        AS total_customers,
+               count(DISTINCT CASE WHEN prox_compra_7_dias = 1 THEN client_id END) AS next_buy_true,
+               avg(prob_prox_compra_7_dias)                                     AS avg_prob,
+               total(CASE WHEN prox_compra_7_dias = 1 THEN total_value END)     AS predicted_revenue
+        FROM {TABLE} WHERE {where}
+        """,
+        params,
+    )
+    row = df.iloc[0]
+    return {
+        "total_customers": int(row["total_customers"]),
+        "next_buy_true": int(row["next_buy_true"]),
+        "avg_prob": float(row["avg_prob"]) if pd.notna(row["avg_prob"]) else float("nan"),
+        "predicted_revenue": float(row["predicted_revenue"]),
+    }
+
+
+def cluster_prob_means() -> Tuple[float, pd.Series]:
+    """Probabilidade média geral e por cluster (base inteira, sem filtros), maior primeiro."""
+    geral = query(f"SELECT avg(prob_prox_compra_7_dias) AS p FROM {TABLE}")["p"].iloc[0]
+    por_cluster = query(
+        f"SELECT tipo_cliente, avg(prob_prox_compra_7_dias) AS p FROM {TABLE} "
+        "WHERE tipo_cliente IS NOT NULL GROUP BY tipo_cliente ORDER BY p DESC"
+    ).set_index("tipo_cliente")["p"]
+    return geral, por_cluster
+
+
+def predicted_clients(f: Optional[Filtros] = None) -> pd.DataFrame:
+    """client_id + tops dos clientes com previsão de compra (todos, ou só os do filtro)."""
+    cols = ["client_id"] + TOP_COLS
+    if f is None:
+        return compact_columns(
+            query(f"SELECT {', '.join(cols)} FROM {TABLE} WHERE prox_compra_7_dias = 1 ORDER BY rowid")
+        )
+    return fetch_filtered(f, cols, only_predicted=True)
+
+
+def predicted_clients_chunks(f: Optional[Filtros] = None, chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Mesmas linhas de predicted_clients, em pedaços de até chunk_rows (para exportação)."""
+    cols = ", ".join(["client_id"] + TOP_COLS)
+    if f is None:
+        where, params = "prox_compra_7_dias = 1", []
+    else:
+        where, params = where_clause(f, only_predicted=True)
+    conn = connect()
+    try:
+        yield from pd.read_sql_query(f"SELECT {cols} FROM {TABLE} WHERE {where} ORDER BY rowid", conn,
+                                     params=params, chunksize=chunk_rows)
+    finally:
+        conn.close()
+
+
+def load_compact() -> Tuple[CompactConsolidado, Dict[str, float]]:
+    """
+    df_consolidado inteiro, compacto, + relatório de memória (antes x depois).
+    A versão object lida do SQLite só existe durante a conversão.
+    """
+    raw = query(f"SELECT * FROM {TABLE} ORDER BY rowid", parse_dates=["purchase_datetime"])
+    compact = CompactConsolidado(raw)
+    return compact, memory_report(raw, compact)
@@ -2,10 +2,21 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import os
 import warnings
 from datetime import date, datetime, timedelta
 import sqlite3
 
+import dashboard_queries as dq
+import dashboard_aggregates as agg
+import dashboard_exports as exp
+from dashboard_filters import FilterEngine
+
+# memory: filtros pelos índices em memória (padrão); sql: filtros empurrados ao SQLite
+DASHBOARD_BACKEND = os.getenv("DASHBOARD_BACKEND", "memory").lower()
+# entradas do LRU de agregados (por página + filtro), compartilhado entre sessões
+AGG_CACHE_ENTRIES = int(os.getenv("AGG_CACHE_ENTRIES", "256"))
+
 warnings.filterwarnings('ignore')
 
 # CONFIGURAÇÃO DA PÁGINA
@@ -122,34 +133,52 @@ st.markdown("""
 #finally:
 #    conn.close()
 
-# FUNÇÃO PARA LER O BANCO DE DADOS 
+# FUNÇÕES PARA LER O BANCO DE DADOS
+# A tabela df_consolidado é materializada (com índices) por build_dashboard_db.py
+# a cada rodada dos modelos. O app não carrega a tabela inteira: cada filtro vira
+# SQL (dashboard_queries) e só as linhas/colunas da página ativa são lidas.
+# O build_stamp entra na chave do cache: um novo build invalida as opções.
 @st.cache_data
-def load_data_from_db():
-    conn = sqlite3.connect('data/dashboard_data.db')
-    
-    df_clusters = pd.read_sql_query("SELECT * FROM clientes_com_clusters", conn)
-    df_pred_compra = pd.read_sql_query("SELECT * FROM predicao_prox_compra", conn)
-    df_pred_rota = pd.read_sql_query("SELECT * FROM predicoes_next_route", conn)
-    df_completo = pd.read_sql_query("SELECT * FROM df_curado", conn)
-    
-    df_consolidado = pd.merge(df_clusters, df_pred_compra, on='client_id', how='left')
-    df_consolidado = pd.merge(df_consolidado, df_pred_rota, on='client_id', how='left')
-    df_consolidado = pd.merge(df_consolidado, df_completo[['client_id', 'purchase_datetime','total_value']], on='client_id', how='left')
-    df_consolidado['purchase_datetime'] = pd.to_datetime(df_consolidado['purchase_datetime'])
-    df_consolidado.drop_duplicates(subset=['client_id'], inplace=True)
-    
-    # Criando a nova coluna de 'acerto_previsao_compra'
-    df_consolidado['acerto_previsao_compra'] = ((df_consolidado['prox_compra_7_dias'] == 1.0) & (df_consolidado['total_value'].notna())).astype(int)
+def load_sidebar_options(build_stamp):
+    return dq.cluster_options(), dq.date_bounds()
+
 
-    # Adicione esta linha para salvar a tabela no banco de dados
-    df_consolidado.to_sql('df_consolidado', conn, if_exists='replace', index=False)
+@st.cache_data
+def load_cluster_prob_means(build_stamp):
+    return dq.cluster_prob_means()
 
-    conn.close()
 
-    return df_consolidado
-    
+# df_consolidado completo em formato compacto (categorias, numéricos reduzidos,
+# client_id em 32 bytes): uma cópia por processo, compartilhada entre sessões.
+@st.cache_resource
+def load_compact_consolidado(build_stamp):
+    return dq.load_compact()
+
+
+# Índices de filtro (datas, clusters, probabilidade) montados uma vez por carga
+@st.cache_resource
+def load_filter_engine(build_stamp):
+    compact, _ = load_compact_consolidado(build_stamp)
+    return FilterEngine(compact)
+
+
+def data_source(build_stamp, backend):
+    return load_filter_engine(build_stamp) if backend == "memory" else dq
+
+
+# Agregados chaveados por (base, fonte, página, filtros normalizados): trocar de
+# página ou voltar a um filtro já visto não refaz o trabalho do pandas.
+@st.cache_data(max_entries=AGG_CACHE_ENTRIES, show_spinner=False)
+def cached_summary_metrics(build_stamp, backend, filtros):
+    return data_source(build_stamp, backend).summary_metrics(filtros)
+
 
-df_consolidado = load_data_from_db()
+@st.cache_data(max_entries=AGG_CACHE_ENTRIES, show_spinner=False)
+def cached_page_aggregates(build_stamp, backend, page, filtros):
+    return agg.page_aggregates(data_source(build_stamp, backend), filtros, page)
+
+
+build_stamp = dq.build_stamp()
 
 # --- FUNÇÕES PARA CADA PÁGINA ---
 def render_home_page():
@@ -192,13 +221,15 @@ def render_home_page():
             st.rerun()
 
 
-def render_dashboard_page(df_consolidado):
-    if df_consolidado is None:
-        st.error("Não foi possível carregar os dados. Verifique a conexão com o banco de dados e os arquivos CSV.")
+def render_dashboard_page(build_stamp):
+    if build_stamp is None:
+        st.error("Não foi possível carregar os dados. Verifique se data/dashboard_data.db existe e rode "
+                 "`python build_dashboard_db.py` para gerar a tabela df_consolidado.")
         return
 
+    unique_clusters, (min_date, max_date) = load_sidebar_options(build_stamp)
+
     # Sidebar: Filtro de Cluster
-    unique_clusters = sorted(df_consolidado['tipo_cliente'].unique())
     all_clusters_option = ['Todos'] + unique_clusters
     selected_cluster = st.sidebar.selectbox("Filtrar por Cluster", all_clusters_option)
 
@@ -206,9 +237,9 @@ def render_dashboard_page(df_consolidado):
     st.sidebar.header("🗓️ Filtro de Dados")
     selected_date = st.sidebar.date_input(
         "Filtrar por Data da Compra",
-        value=(df_consolidado['purchase_datetime'].min().date(), df_consolidado['purchase_datetime'].max().date()),
-        min_value=df_consolidado['purchase_datetime'].min().date(),
-        max_value=df_consolidado['purchase_datetime'].max().date()
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
     )
         
     # Sidebar: Filtro de Probabilidade
@@ -226,45 +257,56 @@ def render_dashboard_page(df_consolidado):
     if 'Todos' in selected_tops and len(selected_tops) > 1:
         selected_tops.remove('Todos')
 
-    # FILTRAR DADOS COM BASE NA SELEÇÃO
-    df_filtered = df_consolidado.copy()
-    
-    if selected_cluster != 'Todos':
-        df_filtered = df_filtered[df_filtered['tipo_cliente'] == selected_cluster]
-    
-    if len(selected_date) == 2:
-        start_date, end_date = selected_date
-        df_filtered = df_filtered[(df_filtered['purchase_datetime'].dt.date >= start_date) & 
-                                  (df_filtered['purchase_datetime'].dt.date <= end_date)]
-    
-    df_filtered = df_filtered[df_filtered['prob_prox_compra_7_dias'] >= prob_threshold / 100]
+    # FILTRAR DADOS COM BASE NA SELEÇÃO (só o recorte da página ativa)
+    fonte = data_source(build_stamp, DASHBOARD_BACKEND)
+    filtros = dq.Filtros(selected_cluster, tuple(selected_date), prob_threshold, tuple(selected_tops))
+    page = st.session_state.page
+    aggs = cached_page_aggregates(build_stamp, DASHBOARD_BACKEND, page, agg.normalize_filtros(filtros, page))
 
-    # BOTÃO DE DOWNLOAD DO CSV
+    # DOWNLOAD DAS LISTAS DE CLIENTES PREVISTOS
     st.sidebar.markdown("---")
     st.sidebar.subheader("📥 Opções de Download")
 
-    clientes_com_previsao_positiva = df_consolidado[df_consolidado['prox_compra_7_dias'] == 1.0]
-    if not clientes_com_previsao_positiva.empty:
-        df_para_download_all = clientes_com_previsao_positiva[['client_id', 'top1', 'top2', 'top3', 'top4', 'top5']]
-        csv_para_download_all = df_para_download_all.to_csv(index=False).encode('utf-8')
-        st.sidebar.download_button(
-            label="Download de Todos os Clientes Previstos",
-            data=csv_para_download_all,
-            file_name='todos_clientes_previstos_7dias.csv',
-            mime='text/csv',
-        )
-        
-    clientes_com_previsao_positiva_filtrados = df_filtered[df_filtered['prox_compra_7_dias'] == 1.0]
-    if not clientes_com_previsao_positiva_filtrados.empty:
-        df_para_download_filtered = clientes_com_previsao_positiva_filtrados[['client_id', 'top1', 'top2', 'top3', 'top4', 'top5']]
-        csv_para_download_filtered = df_para_download_filtered.to_csv(index=False).encode('utf-8')
-        st.sidebar.download_button(
-            label="Download dos Clientes Previstos Filtrados",
-            data=csv_para_download_filtered,
-            file_name='clientes_previstos_filtrados_7dias.csv',
-            mime='text/csv',
-        )
-    
+    # Os arquivos só são gerados quando alguém pede (em pedaços, direto para disco) e ficam
+    # guardados por build + filtro + formato: o próximo pedido igual só relê o arquivo.
+    if st.sidebar.toggle("Preparar exportação", key="exportar"):
+        formatos = exp.available_formats()
+        formato = st.sidebar.radio("Formato do arquivo", list(formatos), format_func=lambda k: formatos[k][0],
+                                   horizontal=True)
+        _, ext, mime = formatos[formato]
+        exportacoes = [
+            ("Todos os Clientes Previstos", None, "todos_clientes_previstos_7dias"),
+            ("Clientes Previstos Filtrados", agg.normalize_filtros(filtros, ""), "clientes_previstos_filtrados_7dias"),
+        ]
+        for rotulo, filtro_exp, nome in exportacoes:
+            path = exp.export_path(build_stamp, filtro_exp, formato)
+            if not os.path.exists(path):
+                if not st.sidebar.button(f"Gerar {rotulo}", key=f"gerar_{nome}"):
+                    continue
+                with st.spinner(f"Gerando {rotulo.lower()}..."):
+                    path = exp.ensure_export(fonte, build_stamp, filtro_exp, formato)
+            with open(path, "rb") as fh:
+                st.sidebar.download_button(
+                    label=f"Download de {rotulo}",
+                    data=fh,
+                    file_name=f"{nome}.{ext}",
+                    mime=mime,
+                    key=f"download_{nome}",
+                    on_click="ignore",
+                )
+
+    # Relatório de memória da base em formato compacto (só no backend em memória:
+    # no sql a base não é carregada no processo)
+    if DASHBOARD_BACKEND == "memory":
+        _, mem = load_compact_consolidado(build_stamp)
+        with st.sidebar.expander("💾 Memória por Cliente"):
+            st.write(f"Clientes: {mem['clientes']:,}")
+            st.write(f"Antes (object/float64): {mem['bytes_por_cliente_antes']:,.0f} bytes/cliente "
+                     f"({mem['bytes_antes'] / 1024**2:,.2f} MB)")
+            st.write(f"Depois (compacto): {mem['bytes_por_cliente_depois']:,.0f} bytes/cliente "
+                     f"({mem['bytes_depois'] / 1024**2:,.2f} MB)")
+            st.write(f"Redução: {mem['reducao'] * 100:.1f}%")
+
     # Adicionando o botão de voltar para a capa na barra lateral
     st.sidebar.markdown("---")
     if st.sidebar.button("🏠 Voltar para o Início"):
@@ -273,53 +315,51 @@ def render_dashboard_page(df_consolidado):
 
     # CONTEUDO PRINCIPAL DO DASHBOARD
     st.header("📊 Métricas Principais")
+    metricas = cached_summary_metrics(build_stamp, DASHBOARD_BACKEND, agg.normalize_filtros(filtros, ""))
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_customers = df_filtered['client_id'].nunique()
-        st.metric("Total de Clientes", f"{total_customers:,}")
+        st.metric("Total de Clientes", f"{metricas['total_customers']:,}")
 
     with col2:
-        next_buy_true = df_filtered[df_filtered['prox_compra_7_dias'] == 1]['client_id'].nunique()
-        st.metric("Clientes que Vão Comprar", f"{next_buy_true:,}")
+        st.metric("Clientes que Vão Comprar", f"{metricas['next_buy_true']:,}")
 
     with col3:
-        avg_prob = df_filtered['prob_prox_compra_7_dias'].mean() * 100
+        avg_prob = metricas['avg_prob'] * 100
         st.metric("Probabilidade Média", f"{avg_prob:.2f}%")
 
     with col4:
-        # Calcular a receita prevista
-        predicted_revenue = df_filtered[df_filtered['prox_compra_7_dias'] == 1]['total_value'].sum()
-        st.metric("Receita Prevista (Próx. 7 dias)", f"R$ {predicted_revenue:,.2f}")
+        # Receita prevista
+        st.metric("Receita Prevista (Próx. 7 dias)", f"R$ {metricas['predicted_revenue']:,.2f}")
 
     st.markdown("---")
 
     
     # Renderização de seções com base na navegação
     
-    if st.session_state.page == "Análise de Clusters":
-        render_cluster_analysis(df_consolidado, df_filtered)
+    if page == "Análise de Clusters":
+        render_cluster_analysis(load_cluster_prob_means(build_stamp), aggs)
     
-    if st.session_state.page == "Previsão de Compra":
-        render_purchase_prediction(df_filtered)
+    if page == "Previsão de Compra":
+        render_purchase_prediction(aggs)
 
-    if st.session_state.page == "Previsão de Rotas":
-        render_route_prediction(df_filtered, selected_tops)
+    if page == "Previsão de Rotas":
+        render_route_prediction(aggs)
     
-    if st.session_state.page == "Comparativo de Receita":
-        render_revenue_comparison(df_filtered)
+    if page == "Comparativo de Receita":
+        render_revenue_comparison(aggs)
 
-    if st.session_state.page == "Receita por Data":
-        render_revenue_by_date(df_filtered)
+    if page == "Receita por Data":
+        render_revenue_by_date(aggs)
 
-def render_cluster_analysis(df_consolidado, df_filtered):
+def render_cluster_analysis(prob_means, aggs):
     st.markdown("<a name='clusters'></a>", unsafe_allow_html=True)
     st.header("👥 Análise de Clientes e Clusters")
     
     col4, col5 = st.columns(2)
-    if not df_consolidado.empty:
-        prob_media_geral = df_consolidado['prob_prox_compra_7_dias'].mean() * 100
-        cluster_prob_media = df_consolidado.groupby('tipo_cliente')['prob_prox_compra_7_dias'].mean().sort_values(ascending=False)
+    prob_media_geral, cluster_prob_media = prob_means
+    if not cluster_prob_media.empty:
+        prob_media_geral = prob_media_geral * 100
 
         cluster_maior_prob = cluster_prob_media.index[0]
         maior_prob_valor = cluster_prob_media.values[0] * 100
@@ -369,9 +409,9 @@ def render_cluster_analysis(df_consolidado, df_filtered):
     
     st.markdown("### Distribuição dos Clusters")
     col1, col2 = st.columns(2)
-    if not df_filtered.empty:
+    if not aggs['empty']:
         with col1:
-            cluster_counts = df_filtered['tipo_cliente'].value_counts()
+            cluster_counts = aggs['cluster_counts']
             fig_clusters = px.pie(
                 values=cluster_counts.values,
                 names=cluster_counts.index,
@@ -394,17 +434,15 @@ def render_cluster_analysis(df_consolidado, df_filtered):
         st.info("Não há dados de clusters para os filtros selecionados.")
     st.markdown("---")
 
-def render_purchase_prediction(df_filtered):
+def render_purchase_prediction(aggs):
     st.markdown("<a name='compra'></a>", unsafe_allow_html=True)
     st.header("💰 Previsão de Próxima Compra")
     col1, col2 = st.columns(2)
     
-    if not df_filtered.empty:
+    if not aggs['empty']:
         with col1:
             st.markdown("### Distribuição da Probabilidade de Compra")
-            prob_data = df_filtered.groupby(pd.cut(df_filtered['prob_prox_compra_7_dias'], bins=10)).size().reset_index(name='count')
-            prob_data['percentage'] = (prob_data['count'] / prob_data['count'].sum()) * 100
-            prob_data['prob_range'] = prob_data['prob_prox_compra_7_dias'].apply(lambda i: f"{int(i.left * 100)}-{int(i.right * 100)}%")
+            prob_data = aggs['prob_histogram']
             
             fig_hist = px.bar(
                 prob_data,
@@ -418,9 +456,7 @@ def render_purchase_prediction(df_filtered):
             
         with col2:
             st.markdown("### Clientes que Vão Comprar nos Próximos 7 Dias")
-            buy_counts = df_filtered['prox_compra_7_dias'].value_counts().reset_index()
-            buy_counts.columns = ['Vão Comprar', 'count']
-            buy_counts['Vão Comprar'] = buy_counts['Vão Comprar'].map({0.0: 'Não Vão Comprar', 1.0: 'Vão Comprar'})
+            buy_counts = aggs['buy_counts']
             
             fig_buy_bar = px.bar(
                 buy_counts,
@@ -437,25 +473,15 @@ def render_purchase_prediction(df_filtered):
         st.info("Não há dados de previsão de compra para os filtros selecionados.")
     st.markdown("---")
 
-def render_route_prediction(df_filtered, selected_tops):
+def render_route_prediction(aggs):
     st.markdown("<a name='rotas'></a>", unsafe_allow_html=True)
     st.header("📍 Previsão da Próxima Rota")
     
-    clientes_que_vao_comprar = df_filtered[df_filtered['prox_compra_7_dias'] == 1.0].copy()
-
-    if 'Todos' not in selected_tops and selected_tops:
-        mask = clientes_que_vao_comprar[selected_tops].notna().any(axis=1)
-        clientes_que_vao_comprar = clientes_que_vao_comprar[mask]
-    
-    if not clientes_que_vao_comprar.empty:
-        selected_routes_data = clientes_que_vao_comprar[selected_tops] if 'Todos' not in selected_tops else clientes_que_vao_comprar[['top1', 'top2', 'top3', 'top4', 'top5']]
-        all_routes = pd.concat([selected_routes_data[col] for col in selected_routes_data.columns]).dropna()
-        top_routes_counts = all_routes.value_counts().head(5).sort_values(ascending=False)
+    # o recorte da página já vem só com os clientes previstos e com o filtro de tops
+    if not aggs['empty']:
+        df_top_routes = aggs['top_routes']
         
-        if not top_routes_counts.empty:
-            df_top_routes = top_routes_counts.reset_index()
-            df_top_routes.columns = ['Rota', 'Contagem']
-
+        if not df_top_routes.empty:
             fig_routes_bar = px.bar(
                 df_top_routes,
                 x='Rota',
@@ -476,17 +502,12 @@ def render_route_prediction(df_filtered, selected_tops):
         st.info("Nenhum cliente com previsão de compra positiva no filtro selecionado para exibir as rotas.")
     st.markdown("---")
 
-def render_revenue_comparison(df_filtered):
+def render_revenue_comparison(aggs):
     st.markdown("<a name='receita'></a>", unsafe_allow_html=True)
     st.header("📈 Comparativo de Receita: Previstos vs. Não Previstos")
 
-    if not df_filtered.empty:
-        revenue_comparison = df_filtered.groupby('prox_compra_7_dias')['total_value'].sum().reset_index()
-        revenue_comparison.columns = ['Previsão de Compra', 'Receita']
-        revenue_comparison['Previsão de Compra'] = revenue_comparison['Previsão de Compra'].map({
-            0.0: 'Receita Clientes NÃO Previstos 7 dias',
-            1.0: 'Receita Clientes Previstos 7 dias'
-        })
+    if not aggs['empty']:
+        revenue_comparison = aggs['revenue_comparison']
         
         fig_revenue_comp = px.bar(
             revenue_comparison,
@@ -514,13 +535,12 @@ def render_revenue_comparison(df_filtered):
         st.info("Não há dados para os filtros selecionados.")
     st.markdown("---")
 
-def render_revenue_by_date(df_filtered):
+def render_revenue_by_date(aggs):
     st.header("📊 Receita por Data")
     st.markdown("---")
 
-    if not df_filtered.empty:
-        df_daily_revenue = df_filtered.groupby(df_filtered['purchase_datetime'].dt.date)['total_value'].sum().reset_index()
-        df_daily_revenue.columns = ['Data', 'Receita']
+    if not aggs['empty']:
+        df_daily_revenue = aggs['daily_revenue']
 
         fig_revenue_by_date = px.line(
             df_daily_revenue,
@@ -550,4 +570,4 @@ if 'page' not in st.session_state:
 if st.session_state.page == "Capa":
     render_home_page()
 else:
-    render_dashboard_page(df_consolidado)
+    render_dashboard_page(build_stamp)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Previsões do dashboard (build_forecasts) com origem/destino nulos no cubo."""
+
+import os
+import sys
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import build_dashboard_db as bdb  # noqa: E402
+import build_forecasts as bf  # noqa: E402
+
+
+def cubo_com_nulos(dias: int = 70) -> pd.DataFrame:
+    """Três rotas com venda todo dia, uma delas com destino nulo (como o cubo com dropna=False)."""
+    datas = pd.date_range("2024-01-01", periods=dias, freq="D")
+    rotas = [("A", "X", 10.0), ("A", None, 5.0), ("C", "Y", 7.0)]
+    linhas = [(d, o, x, gmv) for d in datas for o, x, gmv in rotas]
+    cube = pd.DataFrame(linhas, columns=["date_purchase", "place_origin_departure",
+                                         "place_destination_departure", "gmv"])
+    for col in ("place_origin_departure", "place_destination_departure"):
+        cube[col] = cube[col].astype("category")
+    return cube
+
+
+def test_destino_nulo_vira_serie_propria():
+    chaves, _, Y = bf.daily_matrix(cubo_com_nulos(), 28)
+    serie = {(o, d): Y[i] for i, (o, d) in enumerate(zip(chaves["origem"], chaves["destino"]))}
+
+    assert not chaves.duplicated().any()
+    assert np.allclose(serie[("A", bf.SEM_LOCAL)], 5.0)
+    assert np.allclose(serie[("C", "Y")], 7.0)
+    assert np.allclose(serie[("A", bf.TODOS)], 15.0)
+    assert np.allclose(serie[(bf.TODOS, bf.TODOS)], 22.0)
+
+
+def test_publica_serie_e_resumo_juntos():
+    longa, resumo = bf.build_forecasts(cubo_com_nulos(), horizon=14, history_days=28, fit_weeks=4)
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    bdb.publish_tables(conn, [(bf.TABLE_PREVISAO, longa, bf.INDEXES_PREVISAO),
+                              (bf.TABLE_RESUMO, resumo, bf.INDEXES_RESUMO)])
+
+    builds = dict(conn.execute(f"SELECT table_name, built_at FROM {bdb.TABLE_BUILD}").fetchall())
+    assert builds[bf.TABLE_PREVISAO] == builds[bf.TABLE_RESUMO]
+    n = conn.execute(f"SELECT count(*) FROM {bf.TABLE_RESUMO} WHERE origem = ? AND destino = ?",
+                     ["A", bf.SEM_LOCAL]).fetchone()[0]
+    assert n == 1
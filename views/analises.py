@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from views import dados
+
 
 def page():
     # Custom CSS with your color palette
@@ -41,8 +43,8 @@ def page():
     """, unsafe_allow_html=True)
 
     # -- CARREGAMENTO DOS DADOS -- #
-    df = pd.read_csv("data/df_t.csv", sep=',', encoding_errors='ignore')
-    df['date_purchase'] = pd.to_datetime(df['date_purchase'])
+    # Cubo de demanda pré-agregado (views/dados.py): os filtros só somam células do cubo
+    cube = dados.load_cube()
 
     # -- FILTROS -- #
     col1, col2, col3 = st.columns(3)
@@ -50,32 +52,23 @@ def page():
         # Filtro por período
         date_range = st.date_input(
             "Período de Análise",
-            value=(df['date_purchase'].min(), df['date_purchase'].max()),
-            min_value=df['date_purchase'].min(),
-            max_value=df['date_purchase'].max()
+            value=(cube['date_purchase'].min(), cube['date_purchase'].max()),
+            min_value=cube['date_purchase'].min(),
+            max_value=cube['date_purchase'].max()
         )
 
     with col2:
         # Filtro de origem
-        origins = ['Todos'] + sorted(df['place_origin_departure'].unique().tolist())
+        origins = ['Todos'] + cube['place_origin_departure'].cat.categories.tolist()
         selected_origin = st.selectbox("Origem", origins)
 
     with col3:
         # Filtro de destino
-        destinations = ['Todos'] + sorted(df['place_destination_departure'].unique().tolist())
+        destinations = ['Todos'] + cube['place_destination_departure'].cat.categories.tolist()
         selected_destination = st.selectbox("Destino", destinations)
 
-    # Filtrar dados no dataframe com base nos filtros selecionados na página
-    filtered_df = df[
-        (df['date_purchase'] >= pd.to_datetime(date_range[0])) &
-        (df['date_purchase'] <= pd.to_datetime(date_range[1]))
-    ]
-
-    if selected_origin != 'Todos':
-        filtered_df = filtered_df[filtered_df['place_origin_departure'] == selected_origin]
-
-    if selected_destination != 'Todos':
-        filtered_df = filtered_df[filtered_df['place_destination_departure'] == selected_destination]
+    # Células do cubo dentro dos filtros selecionados na página
+    filtered_cube = dados.rollup(cube, date_range, selected_origin, selected_destination)
 
     # Acrescenta espaço entre os filtros e as métricas
     st.markdown("<hr>", unsafe_allow_html=True)
@@ -83,8 +76,8 @@ def page():
     # -- MÉTRICAS -- #
     
     st.subheader("📊 Métricas de Desempenho")
-    total_tickets = filtered_df['nk_ota_localizer_id'].nunique()
-    receita_total = filtered_df['gmv_success'].sum()
+    total_tickets = int(filtered_cube['orders'].sum())  # = nunique de nk_ota_localizer_id (dados.check_cube)
+    receita_total = filtered_cube['gmv'].sum()
     receita_media_por_ticket = receita_total / total_tickets if total_tickets > 0 else 0
     # Display metrics
     col1, col2, col3 = st.columns(3)
@@ -100,8 +93,10 @@ def page():
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("📍 Origens e Destinos mais relevantes")
     # Top destinations
-    top_destinations = filtered_df['place_destination_departure'].value_counts().head(5)
-    top_origins = filtered_df['place_origin_departure'].value_counts().head(5)
+    top_destinations = (filtered_cube.groupby('place_destination_departure', observed=True)['orders']
+                        .sum().sort_values(ascending=False).head(5))
+    top_origins = (filtered_cube.groupby('place_origin_departure', observed=True)['orders']
+                   .sum().sort_values(ascending=False).head(5))
 
     col1, col2 = st.columns(2)
     with col1:
@@ -161,8 +156,8 @@ def page():
     # Vendas ao longo do tempo
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("📈 Evolução das vendas ao longo do tempo")
-    filtered_df['date_purchase'] = pd.to_datetime(filtered_df['date_purchase'])
-    sales_over_time = filtered_df.groupby('date_purchase').agg({'gmv_success': 'sum'}).reset_index()
+    sales_over_time = (filtered_cube.groupby('date_purchase')['gmv'].sum()
+                       .rename('gmv_success').reset_index())
     fig_sales = px.line(
         sales_over_time,
         x='date_purchase',
@@ -183,8 +178,7 @@ def page():
     col1, col2 = st.columns(2)
     # Horários de maior volume de compras
     with col1:
-        filtered_df['time_purchase'] = pd.to_datetime(filtered_df['time_purchase'], format='%H:%M:%S').dt.hour
-        time_counts = filtered_df['time_purchase'].value_counts().sort_index()
+        time_counts = filtered_cube.groupby('hour_purchase')['orders'].sum()
         fig_time = go.Figure()
         fig_time.add_trace(go.Scatter(
             x=time_counts.index,
@@ -209,13 +203,12 @@ def page():
 
     with col2:
         # heatmap de demanda por dia e hora
-        # Cria uma coluna de dia da semana
-        filtered_df['day_of_week'] = filtered_df['date_purchase'].dt.day_name()
-        # Agrupa por dia da semana e hora do dia
-        demand_heatmap = filtered_df.groupby(['day_of_week', 'time_purchase']).size().unstack(fill_value=0)
-        # Reordena os dias da semana
+        # Agrupa por dia da semana (0 = segunda) e hora do dia
         days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        demand_heatmap = demand_heatmap.reindex(days_order)
+        demand_heatmap = filtered_cube.groupby(['weekday', 'hour_purchase'])['orders'].sum().unstack(fill_value=0)
+        # Reordena os dias da semana
+        demand_heatmap = demand_heatmap.reindex(range(7))
+        demand_heatmap.index = days_order
         # Cria o heatmap
         fig_heatmap = px.imshow(
             demand_heatmap,
@@ -0,0 +1,220 @@
+"""
+Carga compartilhada do histórico de compras (data/df_t.csv) para as views.
+
+O CSV é parseado uma única vez para uma cópia tipada em Parquet ao lado dele
+(datas já em datetime64, hora da compra em int8, origem/destino como category,
+inteiros reduzidos). Ela só é refeita quando o CSV fica mais novo que o
+Parquet. A leitura do Parquet (memory-map) acontece uma vez por processo, em
+st.cache_resource: as interações seguintes não fazem I/O nem parsing.
+
+O DataFrame devolvido é o mesmo objeto para todas as sessões: as views só
+filtram (o que gera cópia) e nunca atribuem colunas nele.
+
+Para a página de análises há também um cubo de demanda pré-agregado
+(dia × hora × dia da semana × origem × destino × viação, com GMV, passagens
+e pedidos), gravado ao lado da cópia tipada: os filtros da página somam
+células do cubo em vez de varrer o histórico. Para gerar os dois arquivos
+antes de subir o app:
+
+    python -m views.dados
+
+As previsões de GMV da página de previsões vêm prontas do banco do dashboard
+(tabelas previsao_gmv e previsao_gmv_resumo, gravadas por build_forecasts.py)
+e são lidas por (origem, destino), uma vez por build.
+"""
+
+import os
+import sqlite3
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow lê o CSV (ainda uma vez por processo)
+    pq = None
+
+DF_T_CSV = os.getenv("DF_T_CSV", os.path.join("data", "df_t.csv"))
+DF_T_PARQUET = os.getenv("DF_T_PARQUET", os.path.splitext(DF_T_CSV)[0] + ".parquet")
+DF_T_CUBE = os.getenv("DF_T_CUBE", os.path.splitext(DF_T_CSV)[0] + "_cubo.parquet")
+DASHBOARD_DB = os.getenv("DASHBOARD_DB", os.path.join("data", "dashboard_data.db"))
+
+TABLE_PREVISAO = "previsao_gmv"
+TABLE_RESUMO = "previsao_gmv_resumo"
+TABLE_BUILD = "dashboard_build"
+
+CATEGORY_COLS = ["place_origin_departure", "place_destination_departure",
+                 "place_origin_return", "place_destination_return"]
+INT_COLS = ["fk_departure_ota_bus_company", "fk_return_ota_bus_company", "total_tickets_quantity_success"]
+
+# Dimensões do cubo e os nomes das medidas
+CUBE_DIMS = ["date_purchase", "hour_purchase", "weekday", "place_origin_departure",
+             "place_destination_departure", "fk_departure_ota_bus_company"]
+CUBE_MEASURES = {"gmv": ("gmv_success", "sum"),
+                 "tickets": ("total_tickets_quantity_success", "sum"),
+                 "orders": ("nk_ota_localizer_id", "size")}
+
+
+def read_csv_tipado(path: str = DF_T_CSV) -> pd.DataFrame:
+    """Lê o CSV bruto e aplica os tipos da cópia colunar."""
+    df = pd.read_csv(path, sep=',', encoding_errors='ignore')
+    df['date_purchase'] = pd.to_datetime(df['date_purchase'])
+    if 'time_purchase' in df.columns:
+        horas = pd.to_datetime(df['time_purchase'], format='%H:%M:%S', errors='coerce').dt.hour
+        df['hour_purchase'] = horas.astype('int8') if horas.notna().all() else horas.astype('float32')
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).astype('category')
+    for col in INT_COLS:
+        if col in df.columns and df[col].notna().all():
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _temp_path(path: str) -> str:
+    """Arquivo temporário único ao lado de `path` (sessões do Streamlit são threads do mesmo processo)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+
+def ensure_parquet(csv_path: str = DF_T_CSV, parquet_path: str = DF_T_PARQUET) -> str:
+    """Gera (ou regenera, se o CSV mudou) a cópia tipada em Parquet e devolve o caminho."""
+    if os.path.exists(parquet_path) and (not os.path.exists(csv_path)
+                                         or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return parquet_path
+    tmp = _temp_path(parquet_path)
+    try:
+        read_csv_tipado(csv_path).to_parquet(tmp, index=False)
+        os.replace(tmp, parquet_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return parquet_path
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cubo de demanda: uma linha por combinação observada das dimensões, em
+    ordem de data. `orders` conta linhas do histórico, que são um pedido
+    por localizador (check_cube confere); weekday segue dt.weekday (0 = segunda). Dimensões nulas
+    (hora ou viação ausentes) formam células próprias: nenhuma linha fica
+    de fora dos totais.
+    """
+    dims = df[[c for c in CUBE_DIMS if c != "weekday"]].copy()
+    dims["date_purchase"] = dims["date_purchase"].dt.normalize()
+    dims["weekday"] = df["date_purchase"].dt.weekday.astype("int8")
+    cube = (
+        df.groupby([dims[c] for c in CUBE_DIMS], observed=True, sort=True, dropna=False)
+        .agg(**{nome: (col, fn) for nome, (col, fn) in CUBE_MEASURES.items()})
+        .reset_index()
+    )
+    for col in ("tickets", "orders"):
+        cube[col] = pd.to_numeric(cube[col], downcast="integer")
+    check_cube(cube, df)
+    return cube
+
+
+def check_cube(cube: pd.DataFrame, df: pd.DataFrame) -> None:
+    """
+    O cubo tem de somar o mesmo que o histórico bruto (GMV, passagens e pedidos),
+    e cada linha do histórico tem de ser um localizador distinto: só assim a soma
+    de `orders` num recorte é o nk_ota_localizer_id.nunique() dele.
+    """
+    localizadores = df["nk_ota_localizer_id"].nunique()
+    if localizadores != len(df):
+        raise ValueError(f"histórico com {len(df)} linhas e {localizadores} localizadores distintos: "
+                         "orders do cubo não conta pedidos únicos")
+    esperado = {"gmv": df["gmv_success"].sum(), "tickets": df["total_tickets_quantity_success"].sum(),
+                "orders": len(df)}
+    for medida, total in esperado.items():
+        if not np.isclose(cube[medida].sum(), total, rtol=1e-9, atol=1e-6):
+            raise ValueError(f"cubo de demanda inconsistente: {medida} = {cube[medida].sum()} (histórico: {total})")
+
+
+def ensure_cube(csv_path: str = DF_T_CSV, parquet_path: str = DF_T_PARQUET, cube_path: str = DF_T_CUBE) -> str:
+    """Gera (ou regenera, se a cópia tipada mudou) o cubo de demanda e devolve o caminho."""
+    parquet_path = ensure_parquet(csv_path, parquet_path)
+    if os.path.exists(cube_path) and os.path.getmtime(cube_path) >= os.path.getmtime(parquet_path):
+        return cube_path
+    tmp = _temp_path(cube_path)
+    try:
+        build_cube(pd.read_parquet(parquet_path)).to_parquet(tmp, index=False)
+        os.replace(tmp, cube_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return cube_path
+
+
+def rollup(cube: pd.DataFrame, date_range=(), origin: str = "Todos", destination: str = "Todos") -> pd.DataFrame:
+    """Células do cubo dentro dos filtros da página (período inclusivo, origem, destino)."""
+    mask = pd.Series(True, index=cube.index)
+    if len(date_range) == 2:
+        mask &= (cube["date_purchase"] >= pd.to_datetime(date_range[0])) & \
+                (cube["date_purchase"] <= pd.to_datetime(date_range[1]))
+    if origin != "Todos":
+        mask &= cube["place_origin_departure"] == origin
+    if destination != "Todos":
+        mask &= cube["place_destination_departure"] == destination
+    return cube[mask]
+
+
+@st.cache_resource(show_spinner="Carregando histórico de compras...")
+def load_df_t() -> pd.DataFrame:
+    """Histórico de compras tipado, compartilhado entre sessões (não modificar)."""
+    if pq is None:
+        return read_csv_tipado(DF_T_CSV)
+    table = pq.read_table(ensure_parquet(), memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+@st.cache_resource(show_spinner="Carregando cubo de demanda...")
+def load_cube() -> pd.DataFrame:
+    """Cubo de demanda compartilhado entre sessões (não modificar)."""
+    if pq is None:
+        return build_cube(load_df_t())
+    return pq.read_table(ensure_cube(), memory_map=True).to_pandas()
+
+
+# =========================
+# Previsões (banco do dashboard)
+# =========================
+def _query_db(sql: str, params=()) -> pd.DataFrame:
+    conn = sqlite3.connect(f"file:{DASHBOARD_DB}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(sql, conn, params=list(params))
+    finally:
+        conn.close()
+
+
+def forecast_stamp() -> Optional[str]:
+    """built_at da última rodada de build_forecasts.py, ou None se ainda não houve."""
+    try:
+        df = _query_db(f"SELECT built_at FROM {TABLE_BUILD} WHERE table_name = ?", [TABLE_RESUMO])
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return None
+    return df["built_at"].iloc[0] if not df.empty else None
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def load_forecast(stamp: str, origem: str, destino: str) -> Tuple[pd.DataFrame, Optional[dict]]:
+    """
+    (série diária real + prevista, cartões) da rota ou agregado pedido
+    ("Todos" em origem/destino); série vazia e None se não houve vendas na janela.
+    """
+    serie = _query_db(
+        f"SELECT data, gmv, tipo FROM {TABLE_PREVISAO} WHERE origem = ? AND destino = ? ORDER BY data",
+        [origem, destino],
+    )
+    serie["data"] = pd.to_datetime(serie["data"])
+    resumo = _query_db(f"SELECT * FROM {TABLE_RESUMO} WHERE origem = ? AND destino = ?", [origem, destino])
+    return serie, (resumo.iloc[0].to_dict() if not resumo.empty else None)
+
+
+if __name__ == "__main__":
+    print(f"Cópia tipada: {ensure_parquet()}")
+    print(f"Cubo de demanda: {ensure_cube()}")
@@ -4,6 +4,8 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
+from views import dados
+
 
 def page():
     # Custom CSS with your color palette
@@ -42,8 +44,7 @@ def page():
     """, unsafe_allow_html=True)
 
     # -- CARREGAMENTO DOS DADOS -- #
-    df = pd.read_csv("data/df_t.csv", sep=',', encoding_errors='ignore')
-    df['date_purchase'] = pd.to_datetime(df['date_purchase'])
+    df = dados.load_df_t()  # cópia tipada compartilhada (views/dados.py): sem I/O nas interações
 
     # -- FILTROS -- #
     col1, col2, col3 = st.columns(3)
@@ -58,12 +59,12 @@ def page():
 
     with col2:
         # Filtro de origem
-        origins = ['Todos'] + sorted(df['place_origin_departure'].unique().tolist())
+        origins = ['Todos'] + df['place_origin_departure'].cat.categories.tolist()
         selected_origin = st.selectbox("Origem", origins)
 
     with col3:
         # Filtro de destino
-        destinations = ['Todos'] + sorted(df['place_destination_departure'].unique().tolist())
+        destinations = ['Todos'] + df['place_destination_departure'].cat.categories.tolist()
         selected_destination = st.selectbox("Destino", destinations)
 
     # Filtrar dados no dataframe com base nos filtros selecionados na página
@@ -143,12 +144,29 @@ def page():
     }
     </style>
     """, unsafe_allow_html=True)
+    # Previsões prontas (build_forecasts.py), pela rota ou agregado dos filtros
+    stamp = dados.forecast_stamp()
+    if stamp is None:
+        st.info("Previsões ainda não geradas: rode `python build_forecasts.py` para gravá-las no banco do dashboard.")
+        serie, resumo = pd.DataFrame(columns=['data', 'gmv', 'tipo']), None
+    else:
+        serie, resumo = dados.load_forecast(stamp, selected_origin, selected_destination)
+
+    if resumo is not None:
+        pico = pd.Timestamp(resumo['pico_inicio'])
+        meses = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+        alerta_value = int(resumo['alertas'])
+        pico_value = f"{meses[pico.month - 1]}. Sem. {(pico.day - 1) // 7 + 1}"
+        pico_desc = f"{resumo['pico_vs_media'] * 100:+.0f}% vs. média semanal prevista"
+        tendencia_value = f"{resumo['tendencia'] * 100:+.0f}%"
+    else:
+        alerta_value, pico_value, pico_desc, tendencia_value = "-", "-", "Sem vendas recentes", "-"
+
     col1, col2, col3 = st.columns(3)
 
     with col1:
         # Alerta Crítico
-        alerta_value = 5
-        alerta_desc = "Períodos com alta demanda"
+        alerta_desc = "Dias previstos com alta demanda"
         alerta_card = f"""
         <div class="card-container">
             <div class="card alerta">
@@ -162,8 +180,6 @@ def page():
 
     with col2:
         # Próximo Pico
-        pico_value = "Out. Sem. 4"
-        pico_desc = "98% de demanda prevista"
         pico_card = f"""
         <div class="card-container">
             <div class="card pico">
@@ -176,8 +192,7 @@ def page():
         st.markdown(pico_card, unsafe_allow_html=True)
     with col3:
         # Tendência
-        tendencia_value = "+15%"
-        tendencia_desc = "Crescimento médio"
+        tendencia_desc = "Média prevista vs. últimas 4 semanas"
         tendencia_card = f"""
         <div class="card-container">
             <div class="card tendencia">
@@ -195,38 +210,13 @@ def page():
     # -- PREVISÕES -- #
     st.subheader("📈 Previsão de vendas de passagens")
 
-    # --- Simula dados reais (jan a mar de 2023) ---
-    real_dates = pd.date_range(start='2023-01-01', end='2023-03-31', freq='D')
-    real_values = np.random.normal(loc=48000, scale=4000, size=len(real_dates))
-
-    real_df = pd.DataFrame({
-        'date_purchase': real_dates,
-        'gmv_success': real_values,
-        'tipo': 'Real'
-    })
-
-    # --- Simula dados de previsão (abr a mai de 2023) ---
-    forecast_dates = pd.date_range(start='2023-04-01', end='2023-05-31', freq='D')
-    trend = np.linspace(real_df['gmv_success'].mean(), real_df['gmv_success'].mean() * 1.15, len(forecast_dates))
-    noise = np.random.normal(loc=0, scale=3500, size=len(forecast_dates))
-
-    forecast_df = pd.DataFrame({
-        'date_purchase': forecast_dates,
-        'gmv_success': trend + noise,
-        'tipo': 'Previsto'
-    })
-
-    # Junta os dados
-    full_df = pd.concat([real_df, forecast_df])
-    full_df = full_df.sort_values('date_purchase')
-
     # Criação do gráfico
     fig = go.Figure()
 
     # Linha de dados reais
     fig.add_trace(go.Scatter(
-        x=full_df[full_df['tipo'] == 'Real']['date_purchase'],
-        y=full_df[full_df['tipo'] == 'Real']['gmv_success'],
+        x=serie[serie['tipo'] == 'real']['data'],
+        y=serie[serie['tipo'] == 'real']['gmv'],
         mode='lines',
         name='Vendas realizadas',
         line=dict(color='#3b2899', width=2)
@@ -234,15 +224,15 @@ def page():
 
     # Linha de previsão
     fig.add_trace(go.Scatter(
-        x=full_df[full_df['tipo'] == 'Previsto']['date_purchase'],
-        y=full_df[full_df['tipo'] == 'Previsto']['gmv_success'],
+        x=serie[serie['tipo'] == 'previsto']['data'],
+        y=serie[serie['tipo'] == 'previsto']['gmv'],
         mode='lines',
         name='Previsão',
         line=dict(color='#ff4f63', width=2, dash='dash')
     ))
 
     fig.update_layout(
-        title='Previsão de vendas de passagens | Fictício',
+        title=f'Previsão de vendas de passagens | {selected_origin} → {selected_destination}',
         xaxis_title='Data',
         yaxis_title='Valor total das vendas (R$)',
         template='plotly_white',